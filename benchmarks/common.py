@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic bases and documents shared by the benchmark scripts.
+"""
+import time
+import datetime
+from liblightbase.lbutils.conv import dict2base
+from liblightbase.lbdoc.metadata import DocumentMetadata
+from liblightbase.tests.helpers import field
+from liblightbase.tests.helpers import group
+
+# Datatypes used on generated fields, with a sample value for each one.
+SAMPLES = [
+    ('Text', 'lorem ipsum'),
+    ('Integer', 42),
+    ('Decimal', 3.14),
+    ('Boolean', True),
+    ('Date', '02/08/2014'),
+    ('DateTime', '02/08/2014 10:21:49'),
+    ('Time', '10:21:49'),
+    ('Json', {'a': [1, 2, 3], 'b': {'c': None}}),
+    ('Url', 'http://lightbase.com.br/'),
+    ('TextArea', 'dolor sit amet'),
+]
+
+
+def make_base_dict(nfields=50, name='bench'):
+    """
+    Base with @param nfields fields: a third at top level, the others inside
+    a multivalued group that holds a nested multivalued group. Each level has
+    one relational (Unico) field.
+    """
+    per_level = nfields // 3
+    levels = [[], [], []]
+    for i in range(nfields):
+        level = min(i // per_level, 2)
+        datatype, _ = SAMPLES[i % len(SAMPLES)]
+        multivalued = i % 4 == 3
+        indices = ['Textual', 'Unico'] if i % per_level == 0 else ['Textual']
+        levels[level].append(field('f%d' % i, datatype, multivalued,
+            required=i == 0, indices=indices))
+    inner = group('inner', levels[2])
+    outer = group('outer', levels[1] + [inner])
+    return {
+        'metadata': {'name': name, 'description': name},
+        'content': levels[0] + [outer]}
+
+
+def make_base(nfields=50):
+    return dict2base(make_base_dict(nfields))
+
+
+def make_document(base, outer=3, inner=3):
+    """ Build a valid document for base created by make_base().
+    """
+    def fill(content):
+        doc = {}
+        for struct in content:
+            if struct.is_group:
+                doc[struct.metadata.name] = [fill(struct.content)
+                    for _ in range(inner if struct.metadata.name == 'inner'
+                    else outer)]
+            else:
+                value = dict(SAMPLES)[struct.datatype]
+                doc[struct.name] = [value, value] if struct.multivalued \
+                    else value
+        return doc
+    return fill(base.content)
+
+
+def make_metadata(id_doc):
+    now = datetime.datetime.now()
+    return DocumentMetadata(id_doc, now, now)
+
+
+def rate(fn, iterations):
+    """ Run @param fn @param iterations times, returning calls per second.
+    """
+    start = time.time()
+    for i in range(iterations):
+        fn(i)
+    return iterations / (time.time() - start)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Documents per second built by conv.dict2document on a 200 fields base with
+nested multivalued groups, validating each value and in trusted mode.
+
+    python -m benchmarks.document_bench [iterations]
+"""
+import sys
+import copy
+from liblightbase.lbutils.conv import dict2document
+from liblightbase.lbutils.conv import document2dict
+from benchmarks import common
+
+
+def main(iterations=200):
+    base = common.make_base(200)
+    document = common.make_document(base)
+    document['_metadata'] = {'id_doc': 1,
+        'dt_doc': '02/08/2014 10:21:49',
+        'dt_last_up': '02/08/2014 10:21:49'}
+    # dict2document takes _metadata out of the dictionary it's given.
+    copies = [copy.deepcopy(document) for i in range(iterations)]
+
+    assert document2dict(base, dict2document(base, copy.deepcopy(document),
+        trusted=True)) == document2dict(base, dict2document(base,
+        copy.deepcopy(document)))
+
+    checked = common.rate(lambda i: dict2document(base, copies[i]),
+        iterations)
+    trusted = common.rate(lambda i: dict2document(base, document,
+        trusted=True), iterations)
+    print('dict2document:         %10.1f docs/s' % checked)
+    print('dict2document trusted: %10.1f docs/s (%.2fx)' % (trusted,
+        trusted / checked))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
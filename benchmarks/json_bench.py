@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Encode and decode calls per second of lbutils.object2json and
+lbutils.json2object, for each installed JSON backend, on base JSON, document
+JSON and collection JSON of several sizes. The first line of each payload is
+the previous behaviour: a new encoder and decoder for each call.
+
+    python -m benchmarks.json_bench [iterations]
+"""
+import sys
+import json
+from liblightbase import lbutils
+from liblightbase.lbutils.codecs import DocumentJSONEncoder
+from benchmarks import common
+
+
+def uncached_dumps(value):
+    return json.dumps(value, ensure_ascii=False, cls=DocumentJSONEncoder)
+
+
+def uncached_loads(value):
+    return json.JSONDecoder().raw_decode(value)[0]
+
+
+def payloads(base):
+    document = common.make_document(base)
+    document['_metadata'] = common.make_metadata(1).__dict__
+    yield 'base', base.asdict
+    yield 'document', document
+    for size in (10, 100, 1000):
+        yield 'collection %d' % size, {
+            'results': [document] * size,
+            'result_count': size,
+            'limit': size,
+            'offset': 0,
+        }
+
+
+def backends():
+    for name in sorted(lbutils.JSON_BACKENDS):
+        try:
+            lbutils.set_json_backend(name)
+        except ImportError:
+            continue
+        yield name
+
+
+def main(iterations=200):
+    base = common.make_base(50)
+    previous = lbutils.get_json_backend()
+    try:
+        for name, value in payloads(base):
+            text = lbutils.object2json(value)
+            # Around the same number of bytes for every payload.
+            count = max(3, min(iterations * 50,
+                iterations * 100000 // len(text)))
+            print('%s (%d bytes, %d calls)' % (name, len(text), count))
+            encode = common.rate(lambda i: uncached_dumps(value), count)
+            decode = common.rate(lambda i: uncached_loads(text), count)
+            print('  %-8s encode %10.1f/s  decode %10.1f/s' % ('uncached',
+                encode, decode))
+            for backend in backends():
+                _encode = common.rate(lambda i: lbutils.object2json(value),
+                    count)
+                _decode = common.rate(lambda i: lbutils.json2object(text),
+                    count)
+                print('  %-8s encode %10.1f/s (%.2fx)  decode %10.1f/s '
+                    '(%.2fx)' % (backend, _encode, _encode / encode, _decode,
+                    _decode / decode))
+    finally:
+        lbutils.set_json_backend(previous)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Time to apply $add and $remove list descriptors with
+DocumentTree.manual_list, compared to applying them one at a time. Runs a
+small update, handled one descriptor at a time, and a large one, handled
+through a ManualListPlan.
+
+    python -m benchmarks.manual_bench [size] [descriptors]
+"""
+import sys
+import time
+from benchmarks import common
+from liblightbase.lbdoc.doctree import DocumentTree
+
+
+def sequential(doc_list, descriptors):
+    """ Previous behaviour: list.insert and del for each descriptor.
+    """
+    for descriptor in descriptors:
+        for key, value in descriptor.items():
+            args = key.split('#')
+            if args[0] == '$add':
+                doc_list.insert(int(args[1]), value)
+            else:
+                del doc_list[int(args[1])]
+
+
+def make_descriptors(size, count):
+    step = max(size // count, 1)
+    descriptors = [ ]
+    for pos in range(0, size - step, step * 2):
+        descriptors.append({'$remove#%d' % pos: None})
+        descriptors.append({'$add#%d' % (pos + step): 'new'})
+    return descriptors[:count]
+
+
+def measure(tree, size, count):
+    """ Print time of both ways, repeating small updates so they take
+    about as long as large ones.
+    """
+    doc_list = list(range(size))
+    descriptors = make_descriptors(size, count)
+    iterations = max(1, 1000000 // (size * len(descriptors)))
+
+    expected = list(doc_list)
+    sequential(expected, descriptors)
+    result = list(doc_list)
+    tree.manual_list(result, descriptors)
+    assert result == expected
+
+    start = time.time()
+    for _ in range(iterations):
+        sequential(list(doc_list), descriptors)
+    before = (time.time() - start) / iterations
+
+    start = time.time()
+    for _ in range(iterations):
+        tree.manual_list(list(doc_list), descriptors)
+    after = (time.time() - start) / iterations
+    print('%d descriptors on a list of %d' % (len(descriptors), size))
+    print('  one at a time:  %12.6f s' % before)
+    print('  manual_list:    %12.6f s (%.1fx)' % (after, before / after))
+
+
+def main(size=100000, count=10000):
+    tree = DocumentTree({ }, common.make_base(50))
+    for size, count in ((10, 3), (5000, 500), (size, count)):
+        measure(tree, size, count)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
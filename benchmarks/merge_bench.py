@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Time to merge a list of group elements into an existing one with
+DocumentTree.merge_list, compared to the previous element by element lookup.
+
+    python -m benchmarks.merge_bench [elements]
+"""
+import sys
+import time
+from benchmarks import common
+from liblightbase.lbdoc.doctree import DocumentTree
+
+
+def linear_merge(doc_list, new_list):
+    """ Previous behaviour.
+    """
+    for item in new_list:
+        if item not in doc_list:
+            doc_list.append(item)
+
+
+def main(elements=10000):
+    base = common.make_base(50)
+    element = common.make_document(base, outer=1, inner=1)['outer'][0]
+
+    def elements_list(start):
+        return [dict(element, f16='element %d' % i)
+            for i in range(start, start + elements)]
+
+    # Half of the new elements are already present.
+    doc_list = elements_list(0)
+    new_list = elements_list(elements // 2)
+    tree = DocumentTree({ }, base)
+
+    def timed(fn, *args):
+        start = time.time()
+        result = list(doc_list)
+        fn(result, new_list, *args)
+        assert len(result) == elements + elements // 2
+        return time.time() - start
+
+    before = timed(linear_merge)
+    after = timed(tree.merge_list)
+    keyed = timed(tree.merge_list, 'f16')
+    print('%d elements into %d' % (elements, elements))
+    print('linear lookup:      %8.3f s' % before)
+    print('fingerprints:       %8.3f s (%.1fx)' % (after, before / after))
+    print('merge_key:          %8.3f s (%.1fx)' % (keyed, before / keyed))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
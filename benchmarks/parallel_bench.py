@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Documents per second validated by Base.validate_parallel, from one process up
+to @param max_processes, on a synthetic bulk load.
+
+    python -m benchmarks.parallel_bench [documents] [max_processes]
+"""
+import sys
+import time
+import multiprocessing
+from benchmarks import common
+
+
+def documents(base, count):
+    """ Generate (document, _meta) tuples lazily.
+    """
+    document = common.make_document(base, outer=1, inner=1)
+    meta = common.make_metadata(1)
+    for i in range(count):
+        yield document, meta
+
+
+def main(count=1000000, max_processes=None):
+    base = common.make_base(50)
+    max_processes = max_processes or multiprocessing.cpu_count()
+
+    start = time.time()
+    for result in base.validate_many(documents(base, count)):
+        pass
+    serial = count / (time.time() - start)
+    print('validate_many:            %10.1f docs/s' % serial)
+
+    processes = 1
+    while True:
+        start = time.time()
+        for result in base.validate_parallel(documents(base, count),
+                processes):
+            pass
+        parallel = count / (time.time() - start)
+        print('validate_parallel (%3d): %10.1f docs/s (%.2fx)' % (
+            processes, parallel, parallel / serial))
+        if processes >= max_processes:
+            break
+        processes = min(processes * 2, max_processes)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Documents per second validated on a base with two password fields: hashing
+every value, keeping values already hashed, and hashing on a thread pool
+with Base.validate_many.
+
+    python -m benchmarks.password_bench [documents] [threads]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from liblightbase.lbutils.conv import dict2base
+from benchmarks import common
+
+
+def make_base():
+    return dict2base({
+        'metadata': {'name': 'password_bench'},
+        'content': [
+            common.field('login', 'Text'),
+            common.field('senha', 'Password'),
+            common.field('pin', 'Password'),
+        ]})
+
+
+def documents(count, hashed=None):
+    for i in range(count):
+        yield ({'login': str(i), 'senha': hashed or 'senha%d' % i,
+            'pin': hashed or str(i)}, common.make_metadata(i))
+
+
+def batch_rate(base, count, hashed=None):
+    start = time.time()
+    for document, reldata, files, errors in base.validate_many(
+            documents(count, hashed)):
+        assert not errors, errors
+    return count / (time.time() - start)
+
+
+def main(count=20, threads=4):
+    base = make_base()
+    hashed = base.validate(*next(documents(1)))[0]['senha']
+
+    serial = batch_rate(base, count)
+    rehash = batch_rate(base, count, hashed)
+    base.keep_password_hashes = True
+    kept = batch_rate(base, count, hashed)
+    base.password_executor = ThreadPoolExecutor(threads)
+    try:
+        pooled = batch_rate(base, count)
+    finally:
+        base.password_executor.shutdown()
+
+    print('hashing in place:           %10.1f docs/s' % serial)
+    print('revalidation, rehashing:    %10.1f docs/s' % rehash)
+    print('revalidation, hashes kept:  %10.1f docs/s (%.2fx)' % (
+        kept, kept / rehash))
+    print('thread pool (%3d):          %10.1f docs/s (%.2fx)' % (
+        threads, pooled, pooled / serial))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Calls per second of path lookups on repeated paths: parsing jsonpath
+expressions per call, with the compiled expressions cache, and with the
+native resolver used by Base.get_path.
+
+    python -m benchmarks.path_bench [iterations]
+"""
+import sys
+from benchmarks import common
+from liblightbase.lbdoc import doctree
+
+PATHS = [
+    ['f0'],
+    ['outer', '1', 'f17'],
+    ['outer', '*', 'f17'],
+    ['outer', '2', 'inner', '0', 'f34'],
+]
+
+
+def main(iterations=5000):
+    base = common.make_base(50)
+    document = common.make_document(base)
+
+    def get_path(i):
+        return base.get_path(document, PATHS[i % len(PATHS)])
+
+    def jsonpath(i):
+        tree = doctree.DocumentTree(document, base)
+        matches = tree.lbpath2jpath(PATHS[i % len(PATHS)]).find(tree.root)
+        return [tree.match2lbpath(match) for match in matches]
+
+    def native(i):
+        tree = doctree.DocumentTree(document, base)
+        matches = tree.find(PATHS[i % len(PATHS)])
+        return [tree.match2lbpath(match) for match in matches]
+
+    def uncached(i):
+        doctree.JPATH_CACHE.clear()
+        return jsonpath(i)
+
+    before = common.rate(uncached, iterations)
+    doctree.JPATH_CACHE.clear()
+    cached = common.rate(jsonpath, iterations)
+    resolved = common.rate(native, iterations)
+    getter = common.rate(get_path, iterations)
+    print('matches and their lbpaths:')
+    print('  parsed per call:  %10.1f calls/s' % before)
+    print('  cached jsonpath:  %10.1f calls/s (%.2fx)' % (cached,
+        cached / before))
+    print('  native resolver:  %10.1f calls/s (%.2fx)' % (resolved,
+        resolved / before))
+    print('Base.get_path:      %10.1f calls/s' % getter)
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Time to project a select list on many documents with DocumentTree.prune, its
+structural sharing mode and a projection compiled by Base.compile_projection.
+
+    python -m benchmarks.projection_bench [documents]
+"""
+import sys
+import time
+from benchmarks import common
+from liblightbase.lbdoc.doctree import DocumentTree
+
+SELECT = ['f1', 'f5', 'f20', 'f40', '_metadata']
+
+
+def main(count=100000):
+    base = common.make_base(50)
+    document = common.make_document(base)
+    document['_metadata'] = {'id_doc': 1}
+    documents = [document] * count
+    tree = DocumentTree({ }, base)
+
+    def timed(fn):
+        start = time.time()
+        for document in documents:
+            fn(document)
+        return time.time() - start
+
+    before = timed(lambda document: tree.prune(document, SELECT))
+    shared = timed(lambda document: tree.prune(document, SELECT, True))
+    projection = base.compile_projection(SELECT)
+    start = time.time()
+    for projected in projection.project_many(documents):
+        pass
+    compiled = time.time() - start
+    print('%d documents, select %r' % (count, SELECT))
+    print('prune:               %8.3f s' % before)
+    print('prune (share):       %8.3f s (%.1fx)' % (shared, before / shared))
+    print('compiled projection: %8.3f s (%.1fx)' % (compiled,
+        before / compiled))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Single field updates per second on a large document, with DocumentTree
+wrapping the document into Object and Array copies and on inplace mode.
+
+    python -m benchmarks.tree_bench [iterations]
+"""
+import sys
+from benchmarks import common
+
+
+def main(iterations=500):
+    base = common.make_base(50)
+    document = common.make_document(base, outer=50, inner=20)
+    path = ['outer', '10', 'f16']
+
+    def update(i, inplace):
+        return base.put_path(document, path, lambda match: (True, str(i)),
+            inplace=inplace)
+
+    copied = common.rate(lambda i: update(i, False), iterations)
+    inplace = common.rate(lambda i: update(i, True), iterations)
+    print('copy mode:     %10.1f updates/s' % copied)
+    print('inplace mode:  %10.1f updates/s (%.2fx)' % (inplace,
+        inplace / copied))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
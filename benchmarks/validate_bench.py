@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Documents per second validated by Base.validate on a 50 fields base with
+nested multivalued groups.
+
+    python -m benchmarks.validate_bench [iterations]
+"""
+import sys
+import time
+from benchmarks import common
+
+
+def rebuilt_schema(base, document, meta):
+    """ Previous behaviour: build the whole schema for each document.
+    """
+    id = meta.id_doc
+    base.__files__[id] = [ ]
+    base.__reldata__[id] = { }
+    return base.schema(id)(document)
+
+
+def main(iterations=2000):
+    base = common.make_base(50)
+    document = common.make_document(base)
+    meta = common.make_metadata(1)
+
+    before = common.rate(lambda i: rebuilt_schema(base, document, meta),
+        iterations)
+    compiled = common.rate(lambda i: base.validate(document, meta,
+        engine='voluptuous'), iterations)
+    native = common.rate(lambda i: base.validate(document, meta,
+        engine='native'), iterations)
+    start = time.time()
+    for result in base.validate_many((document, meta)
+            for i in range(iterations)):
+        pass
+    batch = iterations / (time.time() - start)
+    print('schema rebuilt per document: %10.1f docs/s' % before)
+    print('compiled voluptuous schema:  %10.1f docs/s (%.2fx)' % (
+        compiled, compiled / before))
+    print('native validator:            %10.1f docs/s (%.2fx)' % (
+        native, native / before))
+    print('native validate_many:        %10.1f docs/s (%.2fx)' % (
+        batch, batch / before))
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
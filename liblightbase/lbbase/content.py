@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
+import itertools
 from liblightbase.lbbase.lbstruct.field import Field
 from liblightbase.lbbase.lbstruct.group import Group
 from liblightbase import lbutils
 
+# Numbers changes on all contents, so no two changes get the same number.
+CHANGES = itertools.count(1)
+
 class Content(list):
     """
     The content is a list of structures that compose the current schema.
@@ -36,6 +40,10 @@ class Content(list):
         # @property asdict: Dictonary (actually list) format of content model. 
         self.asdict = [ ]
 
+        # @property __changed__: Number of the last change on this level,
+        # taken from CHANGES whenever a structure is added or replaced.
+        self.__changed__ = 0
+
         # Initialize super class constructor
         super(Content, self).__init__()
 
@@ -45,6 +53,16 @@ class Content(list):
         """
         return lbutils.object2json(self.asdict)
 
+    @property
+    def __version__(self):
+        """ @property __version__: Changes on this level and on groups
+        contents down. It differs whenever a structure is added or replaced
+        on any level, or a group content is replaced. Used to invalidate
+        compiled validators.
+        """
+        return (self.__changed__,) + tuple(struct.content.__version__
+            for struct in self if isinstance(struct, Group))
+
     def __getitem__(self, index):
         """ x.__getitem__(y) <==> x[y]
         """
@@ -86,6 +104,7 @@ class Content(list):
         self.asdict.append(struct.asdict)
         self.__allstructs__[structname] = struct
         self.__structs__[structname] = struct
+        self.__changed__ = next(CHANGES)
         return super(Content, self).__setitem__(index, struct)
 
     def append(self, struct):
@@ -117,4 +136,5 @@ class Content(list):
         self.asdict.append(struct.asdict)
         self.__allstructs__[structname] = struct
         self.__structs__[structname] = struct
+        self.__changed__ = next(CHANGES)
         return super(Content, self).append(struct)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+from liblightbase.lbtypes.extended import FileExtension
+
+
+class IndexEntry(object):
+    """
+    Structure found at a normalized path of StructIndex.
+    """
+
+    __slots__ = ['struct', 'path', 'dim', 'datatype', 'is_rel', 'element',
+        'relnames', 'has_files']
+
+    def __init__(self, struct, path, dim, element=False, relnames=(),
+            has_files=False):
+
+        # @property struct: Field or Group object.
+        self.struct = struct
+
+        # @property path: Normalized path, like ('dependente', '*',
+        # 'nome_dep').
+        self.path = path
+
+        # @property dim: Number of multivalued levels of the value at path.
+        # It's the Field __dim__ set by dict2base(), for fields.
+        self.dim = dim
+
+        # @property datatype: Field datatype class (BaseDataType subclass),
+        # or None for groups.
+        self.datatype = struct._datatype.__schema__ if struct.is_field \
+            else None
+
+        # @property is_rel: Field holds relational data.
+        self.is_rel = struct.is_field and struct.is_rel
+
+        # @property element: Path locates an element of a multivalued
+        # structure, like ('tags', '*'), instead of the structure itself.
+        self.element = element
+
+        # @property relnames: Names of relational fields at or below path.
+        self.relnames = relnames
+
+        # @property has_files: Structure is or holds a file field.
+        self.has_files = has_files
+
+
+class StructIndex(object):
+    """
+    Index of base structures by normalized path. Paths are normalized
+    replacing indices by '*', so the structure of any document node is found
+    with a single dictionary lookup.
+    """
+
+    def __init__(self, base):
+
+        # @property version: Base content version this index was built for.
+        self.version = base.content.__version__
+
+        # @property paths: Dictionary at the format {normalized path tuple:
+        # IndexEntry}.
+        self.paths = { }
+        self._index_content(base.content, (), 0)
+
+    def _index_content(self, content, parent_path, dim):
+        """ 
+        Index structures of content.
+        @return: Tuple (relational field names, holds file fields) of
+        content.
+        """
+        content_relnames = [ ]
+        content_files = False
+        for struct in content:
+            if struct.is_field:
+                multivalued = struct.multivalued
+                path = parent_path + (struct.name,)
+            else:
+                multivalued = struct.metadata.multivalued
+                path = parent_path + (struct.metadata.name,)
+            struct_dim = dim + 1 if multivalued else dim
+            struct_path = path
+            if multivalued:
+                path = path + ('*',)
+            if struct.is_group:
+                relnames, has_files = self._index_content(struct.content,
+                    path, struct_dim)
+            else:
+                relnames = (struct.name,) if struct.is_rel else ()
+                has_files = issubclass(struct._datatype.__schema__,
+                    FileExtension)
+            self.paths[struct_path] = IndexEntry(struct, struct_path,
+                struct_dim, False, relnames, has_files)
+            if multivalued:
+                self.paths[path] = IndexEntry(struct, path, struct_dim, True,
+                    relnames, has_files)
+            content_relnames.extend(relnames)
+            content_files = content_files or has_files
+        return tuple(content_relnames), content_files
+
+    @staticmethod
+    def normalize(lbpath):
+        """ 
+        @param lbpath: List of nodes, like ['dependente', '0', 'nome_dep'].
+        @return: Normalized path tuple, like ('dependente', '*', 'nome_dep').
+        """
+        return tuple('*' if isinstance(node, int) or node.isdigit() else node
+            for node in lbpath)
+
+    def get(self, lbpath):
+        """ 
+        @param lbpath: List of nodes.
+        @return: IndexEntry of structure located by lbpath, or None.
+        """
+        return self.paths.get(self.normalize(lbpath))
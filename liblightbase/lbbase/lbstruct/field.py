@@ -163,18 +163,19 @@ class Field(object):
         assert isinstance(value, Required), msg.format(self.name, value)
         self._required = value
 
-    def schema(self, base, id=None):
+    def schema(self, base, id=None, context=None):
         """ 
         A database schema is a collection of meta-data that describes the 
         relations in a database. A schema can be simply described as the
         "layout" of a database or the blueprint that outlines the way data is 
         organized into tables. This method build the field schema, returning it.
+        @param context: ValidationContext used by compiled schemas. 
         """
         datatype = self._datatype.__schema__
         if self.multivalued is True:
-            return [datatype(base, self, id)]
+            return [datatype(base, self, id, context)]
         elif self.multivalued is False:
-            return datatype(base, self, id)
+            return datatype(base, self, id, context)
 
     def document_model(self, base):
         """
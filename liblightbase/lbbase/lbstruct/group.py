@@ -169,12 +169,13 @@ class Group():
         assert len(value) > 0, msg
         self._content = value
 
-    def schema(self, base, id):
+    def schema(self, base, id, context=None):
         """ 
         A database schema is a collection of meta-data that describes the 
         relations in a database. A schema can be simply described as the
         "layout" of a database or the blueprint that outlines the way data is 
         organized into tables. This method build the group schema, returning it.
+        @param context: ValidationContext used by compiled schemas. 
         """
         schema = dict()
         for struct in self.content:
@@ -183,9 +184,10 @@ class Group():
             elif struct.is_group:
                 structname = struct.metadata.name
             if getattr(struct, 'required', False):
-                schema[voluptuous.Required(structname)] = struct.schema(base, id)
+                schema[voluptuous.Required(structname)] = struct.schema(base,
+                    id, context)
             else:
-                schema[structname] = struct.schema(base, id)
+                schema[structname] = struct.schema(base, id, context)
         if self.metadata.multivalued is True:
             return [schema]
         elif self.metadata.multivalued is False:
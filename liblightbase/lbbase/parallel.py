@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import collections
+import multiprocessing
+from liblightbase.lbutils import exc
+from liblightbase.lbdoc.metadata import DocumentMetadata
+
+# @property _worker: Dictionary holding the Base object and validation
+# options of the current worker process. Filled by _init_worker().
+_worker = { }
+
+
+def _init_worker(base_json, validate, engine):
+    """
+    Worker process initializer. Builds the Base object once per process.
+    @param base_json: JSON format of base model.
+    """
+    # Imported here because liblightbase.lbutils.conv depends on
+    # liblightbase.lbbase.struct.
+    from liblightbase.lbutils.conv import json2base
+    _worker['base'] = json2base(base_json)
+    _worker['validate'] = validate
+    _worker['engine'] = engine
+
+
+def _validate_chunk(chunk):
+    """
+    Validate a chunk of documents on worker process.
+    @param chunk: List of (document, metadata dictionary) tuples.
+    @return: List of (document, reldata, files, errors) tuples.
+    """
+    documents = ((document, DocumentMetadata(**metadata))
+        for document, metadata in chunk)
+    results = [ ]
+    for document, reldata, files, errors in _worker['base'].validate_many(
+            documents, _worker['validate'], _worker['engine']):
+        # Errors may hold objects that can't be pickled (voluptuous
+        # markers), so only their messages go back to the parent.
+        errors = [exc.ValidationError(str(error)) for error in errors]
+        results.append((document, reldata, files, errors))
+    return results
+
+
+def _chunks(documents, chunksize):
+    """
+    Split documents into lists of (document, metadata dictionary) tuples.
+    @param documents: Iterable of (document, _meta) tuples.
+    """
+    chunk = [ ]
+    for document, _meta in documents:
+        chunk.append((document, _meta.__dict__))
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = [ ]
+    if chunk:
+        yield chunk
+
+
+def validate_parallel(base, documents, processes=None, chunksize=200,
+        validate=True, engine=None):
+    """
+    Validate documents using a pool of worker processes. The base definition
+    is sent to each worker once, as JSON, and documents are streamed to the
+    workers in chunks.
+    @param base: Base object.
+    @param documents: Iterable of (document, _meta) tuples.
+    @param processes: Number of worker processes. Defaults to the number of
+    CPUs.
+    @param chunksize: Number of documents sent to a worker at a time.
+    @return: Generator of (document, reldata, files, errors) tuples, in the
+    same order of @param documents. See Base.validate_many().
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes, _init_worker,
+        (base.json, validate, engine))
+
+    # Keep a bounded number of chunks in flight, so documents are read from
+    # @param documents only as fast as workers consume them.
+    pending = collections.deque()
+    try:
+        for chunk in _chunks(documents, chunksize):
+            pending.append(pool.apply_async(_validate_chunk, (chunk,)))
+            if len(pending) > processes * 2:
+                for result in pending.popleft().get():
+                    yield result
+        while pending:
+            for result in pending.popleft().get():
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
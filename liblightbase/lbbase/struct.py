@@ -1,10 +1,21 @@
+import copy
+import threading
+import collections
 import voluptuous
 
 from liblightbase import lbutils
 from liblightbase.lbutils import exc
+from liblightbase.lbutils.const import PYSTR
 from liblightbase.lbbase.content import Content
 from liblightbase.lbdoc.doctree import DocumentTree
+from liblightbase.lbdoc.doctree import Projection
 from liblightbase.lbbase.metadata import BaseMetadata
+from liblightbase.lbbase.index import StructIndex
+from liblightbase.lbbase.validator import Schema
+from liblightbase.lbbase.validator import VALIDATORS
+from liblightbase.lbbase.validator import Invalid
+from liblightbase.lbbase.validator import MultipleInvalid
+from liblightbase.lbbase.parallel import validate_parallel
 from liblightbase.lbdoc.metaclass import generate_metaclass
 from liblightbase.lbtypes import Matrix
 
@@ -17,6 +28,27 @@ class Base(object):
     to demand (offer what user needs).
     """
 
+    # @property validation_engine: Name of the validation engine used by
+    # default. One of 'native' or 'voluptuous'.
+    validation_engine = 'native'
+
+    # @property document_store_size: Maximum number of documents kept on
+    # @property __files__ and @property __reldata__.
+    document_store_size = 1000
+
+    # @property keep_password_hashes: Password values already in bcrypt hash
+    # format are kept as they are, instead of being hashed again.
+    keep_password_hashes = False
+
+    # @property password_executor: Executor (like a
+    # concurrent.futures.ThreadPoolExecutor) where password hashes are
+    # computed. None hashes in the validating thread.
+    password_executor = None
+
+    # @property password_window: Maximum number of documents waiting for
+    # password hashes on @method validate_many().
+    password_window = 64
+
     def __init__(self, metadata, content):
 
         # @param metadata: The base metadata is all data related to the base.
@@ -34,13 +66,14 @@ class Base(object):
         # files }. This property helps to identify files contained on each
         # document. When document is submitted, the routine should compare 
         # these files to files present at database, deleting those that aren't
-        # present on both lists.
-        self.__files__ = { }
+        # present on both lists. Only the last validated documents are kept,
+        # see @property document_store_size and @method release().
+        self.__files__ = lbutils.LRUStore(self.document_store_size)
 
         # @property __reldata__: A dictionary at the format {id_doc: {field
         # name: data}}. This property contains the data to be submitted at 
-        # relational column at database.
-        self.__reldata__ = { }
+        # relational column at database. Bounded like @property __files__.
+        self.__reldata__ = lbutils.LRUStore(self.document_store_size)
 
         # @property __metaclasses__: A dictionary at the format {structname:
         # metaclass}. All metaclasses are created here, so user can acces them
@@ -57,6 +90,10 @@ class Base(object):
 
         self.__metaclasses__['__base__'] = self._metaclass()
 
+        # @property __structindex__: Structures by normalized path. See
+        # @method get_path_struct().
+        self.__structindex__ = StructIndex(self)
+
     @property
     def metadata(self):
         """ @property metadata getter
@@ -86,62 +123,354 @@ class Base(object):
         msg = 'Base content must have at least one structure.'
         assert len(value) > 0, msg
         self._content = value
+        # Compiled validators keep the state of the document being validated,
+        # so each thread gets its own ones.
+        self._local = threading.local()
 
+    @property
+    def validator(self):
+        """ 
+        @property validator: Compiled validator of the default engine. 
+        """
+        return self.get_validator()
 
-    def validate(self, document, _meta, validate=True, delete=False):
+    def get_validator(self, engine=None):
+        """ 
+        @param engine: Validation engine name. Defaults to
+        @property validation_engine.
+        @return: Compiled validator. It's built on first use and rebuilt only
+        when the base content changes. Validators are not shared between
+        threads.
+        """
+        if engine is None:
+            engine = self.validation_engine
+        try:
+            validators = self._local.validators
+        except AttributeError:
+            validators = self._local.validators = { }
+        validator = validators.get(engine)
+        if validator is None or validator.version != self.content.__version__:
+            try:
+                validator_class = VALIDATORS[engine]
+            except KeyError:
+                raise ValueError('Invalid validation engine: %s' % engine)
+            validator = validators[engine] = validator_class(self)
+        return validator
+
+    def validate(self, document, _meta, validate=True, delete=False,
+            engine=None):
         """ Validate document data structure.
+        @param engine: Validation engine name. Use 'voluptuous' to fall back
+        to the voluptuous based schema.
         """
         id = _meta.id_doc
+        reldata = files = None
+
+        if delete:
+            # Keep adding to data of a previous validation
+            reldata = self.__reldata__.get(id)
+            files = self.__files__.get(id)
+        if reldata is None:
+            reldata = { }
+        if files is None:
+            files = [ ]
+
+        hashes = [ ] if self.password_executor is not None else None
+        try:
+            document = self._validate(self.get_validator(engine), document,
+                _meta, reldata, files, validate, hashes)
+            if hashes:
+                self._resolve_hashes(document, hashes)
+        except exc.ValidationError:
+            # If process goes wrong, clear the docs memory area
+            self.release(id)
+            raise
 
-        if not delete:
+        # Validation itself only uses the sinks above. They are stored for
+        # callers that read them from the base.
+        self.__reldata__[id] = reldata
+        self.__files__[id] = files
+        return (document, reldata, files, [])
 
-            # Para o que serve isso?
-            # Create docs memory area
-            self.__files__[id] = [ ]
-            self.__reldata__[id] = { }
+    def validate_path(self, document, path, _meta, previous=None):
+        """ 
+        Validate only the subtree located by @param path, after it was
+        changed by a path operation. Relational data and files stored for the
+        document by a previous validation are updated where they depend on
+        the subtree. When nothing is stored for the document, or the file ids
+        of the old subtree can't be told, the whole document is validated.
+        @param document: Document holding the changed subtree. Changed in
+        place.
+        @param path: List of nodes, like ['dependente', '0', 'nome_dep'].
+        Paths of list elements that were inserted or removed must locate the
+        list itself, as positions of the following elements change.
+        @param previous: Old value of subtree, used to discard its file ids.
+        @return: Same as @method validate().
+        """
+        id = _meta.id_doc
+        path = [int(node) if isinstance(node, PYSTR) and node.isdigit()
+            else node for node in path]
+        entry = self.get_path_struct(path)
+        if entry is None:
+            raise exc.ValidationError('Structure not found on path %s' %
+                '/'.join(map(str, path)))
+        reldata = self.__reldata__.get(id)
+        files = self.__files__.get(id)
+        if reldata is None or files is None or (entry.has_files and
+                previous is None):
+            return self.validate(document, _meta)
+
+        parent = document
+        try:
+            for node in path[:-1]:
+                parent = parent[node]
+            absent = isinstance(path[-1], PYSTR) and path[-1] not in parent
+            value = None if absent else parent[path[-1]]
+        except (KeyError, IndexError, TypeError):
+            raise exc.ValidationError('Path %s not found on document' %
+                '/'.join(map(str, path)))
+
+        indices = [node for node in path if isinstance(node, int)]
+        for relname in entry.relnames:
+            self._clear_reldata(reldata, relname, indices)
+        if entry.has_files:
+            for id_file in self._subtree_files(entry.struct, previous,
+                    entry.element):
+                if id_file in files:
+                    files.remove(id_file)
 
+        try:
+            if absent:
+                if not entry.element and getattr(entry.struct, 'required',
+                        False):
+                    raise MultipleInvalid([Invalid(
+                        'required key not provided', path)])
+            else:
+                value = self.get_validator('native').validate_path(path,
+                    value, id, reldata, files)
+        except exc.ValidationError:
+            self.release(id)
+            raise
+        except Exception as e:
+            self.release(id)
+            raise exc.ValidationError(e)
+        if not absent:
+            parent[path[-1]] = value
+        top = document.get(path[0])
+        for relname in entry.relnames:
+            self._trim_reldata(reldata, relname, indices)
+            # Same as NativeValidator.normalize()
+            if relname not in reldata and isinstance(top, (list, dict)) and (
+                    not top or not any(True for _ in self.find(relname,
+                    top))):
+                reldata[relname] = None
+
+        document['_metadata'] = _meta.__dict__
+        self.__reldata__[id] = reldata
+        self.__files__[id] = files
+        return (document, reldata, files, [])
+
+    def _clear_reldata(self, reldata, relname, indices):
+        """ 
+        Sets relational data of field @param relname at position @param
+        indices to None.
+        """
+        if not indices:
+            reldata[relname] = None
+            return
+        matrix = reldata.get(relname)
+        if not isinstance(matrix, list):
+            matrix = reldata[relname] = Matrix()
+        for index in indices[:-1]:
+            inner = matrix[index]
+            if not isinstance(inner, list):
+                inner = matrix[index] = Matrix()
+            matrix = inner
+        matrix[indices[-1]] = None
+
+    def _trim_reldata(self, reldata, relname, indices):
+        """ 
+        Removes trailing None items left by @method _clear_reldata() on
+        lists along @param indices, as validation only writes values. Lists
+        left empty are set to None, and relational data left with no value
+        is removed.
+        """
+        lists = [ ]
+        data = reldata.get(relname)
+        for index in indices:
+            if not isinstance(data, list):
+                break
+            lists.append((data, index))
+            data = list.__getitem__(data, index) if index < len(data) \
+                else None
+        while lists:
+            matrix, index = lists.pop()
+            while matrix and matrix[-1] is None:
+                matrix.pop()
+            if matrix:
+                return
+            if lists:
+                parent, index = lists[-1]
+                parent[index] = None
+        if reldata.get(relname) in (None, [ ]):
+            reldata.pop(relname, None)
+
+    def _subtree_files(self, struct, value, element=False):
+        """ 
+        @param element: @param value is an element of multivalued @param
+        struct.
+        @return: Generator of file ids found on @param value.
+        """
+        if value is None:
+            return
+        if struct.is_field:
+            multivalued = struct.multivalued
+        else:
+            multivalued = struct.metadata.multivalued
+        if multivalued and not element:
+            for item in value:
+                for id_file in self._subtree_files(struct, item, True):
+                    yield id_file
+        elif struct.is_field:
+            if isinstance(value, dict) and value.get('id_file'):
+                yield value['id_file']
+        else:
+            for child in struct.content:
+                name = child.name if child.is_field else child.metadata.name
+                for id_file in self._subtree_files(child, value.get(name)):
+                    yield id_file
+
+    def release(self, id):
+        """ 
+        Discard relational data and files stored for document.
+        @param id: The document id (_metadata.id_doc).
+        """
+        self.__files__.pop(id, None)
+        self.__reldata__.pop(id, None)
+
+    def validate_many(self, documents, validate=True, engine=None):
+        """ 
+        Validate a batch of documents with a single compiled validator.
+        @param documents: Iterable of (document, _meta) tuples.
+        @param engine: Validation engine name.
+        @return: Generator of (document, reldata, files, errors) tuples, in
+        the same order of @param documents. A document that fails validation
+        doesn't abort the batch: it's yielded as given, with empty reldata
+        and files, and errors holding the exc.ValidationError raised.
+        """
+        validator = self.get_validator(engine)
+        if self.password_executor is not None:
+            return self._validate_many_hashing(validator, documents,
+                validate)
+        return self._validate_many(validator, documents, validate)
+
+    def _validate_many(self, validator, documents, validate):
+        for document, _meta in documents:
+            reldata = { }
+            files = [ ]
+            try:
+                document = self._validate(validator, document, _meta,
+                    reldata, files, validate)
+            except exc.ValidationError as e:
+                yield (document, { }, [ ], [e])
+            else:
+                yield (document, reldata, files, [])
+
+    def _validate_many_hashing(self, validator, documents, validate):
+        """ 
+        Same as @method _validate_many(), with password hashes computed by
+        @property password_executor while the following documents are
+        validated.
+        """
+        pending = collections.deque()
+        for document, _meta in documents:
+            reldata = { }
+            files = [ ]
+            hashes = [ ]
+            try:
+                document = self._validate(validator, document, _meta,
+                    reldata, files, validate, hashes)
+            except exc.ValidationError as e:
+                pending.append(((document, { }, [ ], [e]), None))
+            else:
+                pending.append(((document, reldata, files, []), hashes))
+            if len(pending) > self.password_window:
+                yield self._hashed_result(*pending.popleft())
+        while pending:
+            yield self._hashed_result(*pending.popleft())
+
+    def _hashed_result(self, result, hashes):
+        """ 
+        @return: @param result of @method validate_many(), with password
+        hashes put on document.
+        """
+        if hashes:
+            try:
+                self._resolve_hashes(result[0], hashes)
+            except exc.ValidationError as e:
+                return (result[0], { }, [ ], [e])
+        return result
+
+    def _resolve_hashes(self, document, hashes):
+        """ 
+        Put deferred password hashes on validated document.
+        @param hashes: List of (path, future) tuples. See
+        validator.ValidationContext.
+        """
+        for path, future in hashes:
+            try:
+                value = future.result()
+            except Exception as e:
+                raise exc.ValidationError(e)
+            branch = document
+            for node in path[:-1]:
+                branch = branch[node]
+            branch[path[-1]] = value
+
+    def validate_parallel(self, documents, processes=None, chunksize=200,
+            validate=True, engine=None):
+        """ 
+        Validate a batch of documents using a pool of worker processes.
+        @param documents: Iterable of (document, _meta) tuples.
+        @param processes: Number of worker processes. Defaults to the number
+        of CPUs.
+        @param chunksize: Number of documents sent to a worker at a time.
+        @return: Generator of (document, reldata, files, errors) tuples, in
+        the same order of @param documents. See @method validate_many().
+        """
+        return validate_parallel(self, documents, processes, chunksize,
+            validate, engine)
+
+    def _validate(self, validator, document, _meta, reldata, files,
+            validate=True, hashes=None):
+        """ 
+        Validate document, writing relational data into @param reldata and
+        file ids into @param files.
+        @param hashes: List where deferred password hashes are put.
+        @return: Validated document, with metadata.
+        """
         if not validate:
             for rel_field in self.__rel_fields__:
-                self.__reldata__[id][rel_field] = document.get(
-                    rel_field, None)
+                reldata[rel_field] = document.get(rel_field, None)
             document['_metadata'] = _meta.__dict__
-            return (document,
-                   self.__reldata__[id],
-                   self.__files__[id],
-                   [])
+            return document
 
         # Delete metadata from document
         if '_metadata' in document: del document['_metadata']
 
-        # Build schema
-        _schema = self.schema(id)
         try:
             # Validates document
-            document = _schema(document)
+            document = validator(document, _meta.id_doc, reldata, files,
+                hashes)
         except Exception as e:
-            # If process goes wrong, clear the docs memory area
-            del self.__files__[id]
-            del self.__reldata__[id]
             raise exc.ValidationError(e)
 
         # Put document metadata back
         document['_metadata'] = _meta.__dict__
 
-
-        for key, value in document.items():
-            if key != '_metadata':
-                struct = self.get_struct(key)
-                if not value and (isinstance(value, list) or isinstance(value, dict)):
-                    self.normalize_reldata(id, struct)
-                elif value and (isinstance(value, list) or isinstance(value, dict)):
-                    self.check_fields(id, struct, document)
-
         #self.check_empty_fields(document)
 
-        return (document,
-               self.__reldata__[id],
-               self.__files__[id],
-               [])
+        return document
 
     # delete path - schema(self, id)
     def schema(self, id):
@@ -160,7 +489,7 @@ class Base(object):
             if getattr(struct, 'required', False):
                 structname = voluptuous.Required(structname)
             schema.update({structname: struct.schema(self, id)})
-        return voluptuous.Schema(schema)
+        return Schema(schema)
 
 
     def check_fields(self,id, struct, document):
@@ -176,22 +505,21 @@ class Base(object):
         """
         @document
         """
-    #if struct.is_rel:
+        if not self.__reldata__.get(id):
+            self.__reldata__[id] = {}
+        self._normalize_reldata(self.__reldata__[id], struct)
+
+    def _normalize_reldata(self, reldata, struct):
+        """
+        Sets reldata of relational fields in struct to None.
+        @param reldata: Dictionary at the format {field name: data}.
+        """
         if struct.is_field:
             if struct.is_rel:
-                #if struct.multivalued:
-                #    self.__reldata__[id][struct.name] = Matrix()
-                #else:
-                #    self.__reldata__[id][struct.name] = None
-                if not self.__reldata__.get(id):
-                    self.__reldata__[id] = {}
-                    self.__reldata__[id][struct.name] = None
-                else:
-                    self.__reldata__[id][struct.name] = None
+                reldata[struct.name] = None
         elif struct.is_group:
             for _field in struct.content:
-                self.normalize_reldata(id, _field)
-                #self.__reldata__[id][_field.name] = None
+                self._normalize_reldata(reldata, _field)
 
     def find(self, key, document):
         """Find key in document"""
@@ -213,6 +541,54 @@ class Base(object):
                             yield result
 
 
+    def get_path_struct(self, lbpath):
+        """ 
+        @param lbpath: List of nodes, like ['dependente', '0', 'nome_dep'].
+        @return: index.IndexEntry with the structure located by lbpath, its
+        dimension, datatype and relational flag; or None if lbpath doesn't
+        locate a structure.
+        """
+        index = self.__structindex__
+        if index.version != self.content.__version__:
+            index = self.__structindex__ = StructIndex(self)
+        return index.get(lbpath)
+
+    def compile_projection(self, select):
+        """ 
+        @param select: List of structure names to keep on documents, like
+        Search.select.
+        @return: Projection object. Call it with a document to get only the
+        selected structures.
+        """
+        return Projection(self, select)
+
+    def get_struct_path(self, sname):
+        """ 
+        @param sname: structure name to find
+        @return: List of nodes locating structure on documents, with '*' for
+        multivalued groups, like ['dependente', '*', 'nome_dep']. It's the
+        path set by dict2base(), or computed from base content.
+        """
+        path = getattr(self.get_struct(sname), 'path', None)
+        if path is not None:
+            return path
+
+        def find(content, parent_path):
+            for struct in content:
+                if struct.is_field:
+                    if struct.name == sname:
+                        return parent_path + [sname]
+                    continue
+                this_path = parent_path + [struct.metadata.name]
+                if struct.metadata.name == sname:
+                    return this_path
+                if struct.metadata.multivalued:
+                    this_path.append('*')
+                path = find(struct.content, this_path)
+                if path is not None:
+                    return path
+        return find(self.content, [ ])
+
     def get_struct(self, sname):
         """ 
         @param sname: structure name to find
@@ -227,6 +603,8 @@ class Base(object):
     def metaclass(self, sname=None, valreq=True):
         """ 
         @param sname: structure name to find
+        @param valreq: Validate required structures when instantiating the
+        metaclass. The flag is kept per thread.
         This method return the metaclass corresponding to sname.
         """
         if sname is None:
@@ -237,7 +615,7 @@ class Base(object):
             except KeyError:
                 msg = "Field %s doesn't exist on base definition." % sname
                 raise KeyError(msg)
-        metaclass.__valreq__ = valreq
+        metaclass.__valreq__.value = valreq
         return metaclass
 
     @property
@@ -259,43 +637,114 @@ class Base(object):
         """
         return DocumentTree(document, self).get_path(path)
 
-    def set_path(self, document, path, fn):
+    def set_path(self, document, path, fn, inplace=False):
         """ Set value from given path in document
+        @param inplace: Change @param document itself and return it, instead
+        of working on a copy. See DocumentTree.
         """
-        document = DocumentTree(document, self, True).set_path(path, fn)
-        return document.todict()
+        tree = DocumentTree(document, self, True, inplace)
+        tree.set_path(path, fn)
+        return tree.document
 
-    def put_path(self, document, path, fn):
+    def put_path(self, document, path, fn, inplace=False):
         """ Put value from given path in document
         """
-        return DocumentTree(document, self, True).put_path(path, fn).todict()
+        tree = DocumentTree(document, self, True, inplace)
+        tree.put_path(path, fn)
+        return tree.document
 
-    def patch_path(self, document, path, fn):
+    def patch_path(self, document, path, fn, inplace=False):
         """ Patch value from given path in document (partial update)
         """
-        return DocumentTree(document, self, True).patch_path(path, fn).todict()
+        tree = DocumentTree(document, self, True, inplace)
+        tree.patch_path(path, fn)
+        return tree.document
 
-    def merge_path(self, document, path, fn):
+    def merge_path(self, document, path, fn, inplace=False, merge_key=None):
         """ Patch value from given path in document (partial update)
+        @param merge_key: Field name identifying group elements when merging
+        lists. See DocumentTree.merge_list().
         """
-        return DocumentTree(document, self, True).merge_path(path, fn).todict()
+        tree = DocumentTree(document, self, True, inplace)
+        tree.merge_path(path, fn, merge_key)
+        return tree.document
 
-    def manual_path(self, document, path, fn):
+    def manual_path(self, document, path, fn, inplace=False):
         """ Patch value from given path in document (partial update)
         """
-        return DocumentTree(document, self, True).manual_path(path, fn).todict()
+        tree = DocumentTree(document, self, True, inplace)
+        tree.manual_path(path, fn)
+        return tree.document
 
     # delete path - delete_path(self, document, path, fn)
-    def delete_path(self, document, path, fn):
+    def delete_path(self, document, path, fn, inplace=False):
         """ Delete value at given path in document
         """
+        self._normalize_path_reldata(document, path)
+        tree = DocumentTree(document, self, inplace=inplace)
+        tree.delete_path(path, fn)
+        return tree.document
+
+    def apply_operations(self, document, operations, functions=None,
+            inplace=False):
+        """ 
+        Apply a list of path operations to document, using a single tree.
+        @param operations: List of lbsearch.path.PathOperation objects. Modes
+        insert, update and delete work like @method set_path(), @method
+        put_path() and @method delete_path(). Delete paths are resolved
+        when their operation is reached, but values are only removed after
+        the other operations, all at once, so indices on paths don't shift.
+        @param functions: Dictionary at the format {fn name: function(match,
+        args)}. Functions return the same as path callbacks. When operation fn
+        is None, insert and update use args[0] as value and delete removes
+        all matches.
+        @param inplace: Change @param document itself and return it.
+        @return: Updated document.
+        """
+        if not inplace:
+            document = copy.deepcopy(document)
+        tree = DocumentTree(document, self, True, True)
+        deletes = set()
+        for operation in operations:
+            path = operation.path.split('/')
+            fn = self._operation_fn(operation, functions)
+            if operation.mode == 'insert':
+                tree.set_path(path, fn)
+            elif operation.mode == 'update':
+                tree.put_path(path, fn)
+            elif operation.mode == 'delete':
+                self._normalize_path_reldata(document, path)
+                deletes.update(tree.find_deletes(path, fn))
+        if deletes:
+            tree.delete_lbpaths(deletes)
+        return tree.document
+
+    def _operation_fn(self, operation, functions):
+        """ 
+        @return: Path callback for PathOperation @param operation.
+        """
+        args = operation.args
+        if operation.fn is not None:
+            try:
+                function = (functions or { })[operation.fn]
+            except KeyError:
+                raise KeyError('Path function %s not found.' % operation.fn)
+            return lambda match: function(match, args)
+        if operation.mode == 'delete':
+            return lambda match: True
+        return lambda match: (True, args[0])
+
+    def _normalize_path_reldata(self, document, path):
+        """ 
+        Sets reldata of structures on @param path, that is going to be
+        deleted, to None.
+        """
         id = document['_metadata']['id_doc']
         for item in path:
             if item == '*' or item.isdigit():
                 continue
             struct = self.get_struct(item)
             self.normalize_reldata(id, struct)
-        return DocumentTree(document, self).delete_path(path, fn).todict()
 
     @property
     def relational_fields(self):
@@ -364,6 +813,4 @@ class Base(object):
         Generate base metaclass. The base metaclass is an abstraction of 
         document model defined by base structures.
         """
-        self.__files__[0] = [ ]
-        self.__reldata__[0] = { }
         return generate_metaclass(self)
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+import voluptuous
+from liblightbase.lbtypes import BaseDataType
+
+
+class ValidationContext(object):
+    """
+    Per document validation state. Holds the document id and the sinks where
+    datatypes write relational data and file ids while the document is
+    validated.
+    """
+
+    __slots__ = ['id', 'reldata', 'files', 'found', 'hashes']
+
+    def __init__(self, id=None, reldata=None, files=None, hashes=None):
+
+        # @property id: The document id (_metadata.id_doc).
+        self.id = id
+
+        # @property reldata: Dictionary at the format {field name: data}.
+        self.reldata = reldata
+
+        # @property files: List of file ids contained on document.
+        self.files = files
+
+        # @property found: Set of relational structure names found on
+        # document. Used to normalize reldata of absent structures.
+        self.found = set()
+
+        # @property hashes: List of (path, future) tuples of password hashes
+        # deferred to Base.password_executor, or None to hash in place.
+        self.hashes = hashes
+
+    def reset(self):
+        """ Release references to the sinks of the last document.
+        """
+        self.id = None
+        self.reldata = None
+        self.files = None
+        self.found = set()
+        self.hashes = None
+
+
+class Schema(voluptuous.Schema):
+    """
+    voluptuous Schema that hands the document path down to datatypes. Each
+    BaseDataType node is compiled into a validator that receives the path
+    of the value being validated, so relational fields inside multivalued
+    structures know their position without inspecting the call stack.
+    """
+
+    def _compile(self, schema):
+        if isinstance(schema, BaseDataType):
+            return self._compile_datatype(schema)
+        return super(Schema, self)._compile(schema)
+
+    def _compile_datatype(self, datatype):
+        """ Same contract as voluptuous callable validators.
+        """
+        def validate_datatype(path, data):
+            try:
+                return datatype(data, path)
+            except ValueError:
+                raise voluptuous.ValueInvalid('not a valid value', path)
+        return validate_datatype
+
+
+class CompiledSchema(object):
+    """
+    Base schema compiled once. Datatype validators are created a single time
+    and bound to a ValidationContext, so the document id and the reldata and
+    files sinks are given as call arguments instead of being built into the
+    schema.
+    """
+
+    def __init__(self, base):
+
+        # @property context: ValidationContext shared by all datatypes of
+        # this schema.
+        self.context = ValidationContext()
+
+        # @property version: Base content version this schema was built for.
+        self.version = base.content.__version__
+
+        schema = dict()
+        for struct in base.content:
+            if struct.is_field:
+                structname = struct.name
+            elif struct.is_group:
+                structname = struct.metadata.name
+            if getattr(struct, 'required', False):
+                structname = voluptuous.Required(structname)
+            schema[structname] = struct.schema(base, None, self.context)
+
+        # @property schema: voluptuous Schema object.
+        self.schema = Schema(schema)
+
+        # @property base: Base object.
+        self.base = base
+
+    def __call__(self, document, id, reldata, files, hashes=None):
+        """
+        Validates document, writing relational data into @param reldata and
+        file ids into @param files.
+        @param hashes: List where deferred password hashes are put. See
+        ValidationContext.
+        @return: Validated document.
+        """
+        context = self.context
+        context.id = id
+        context.reldata = reldata
+        context.files = files
+        context.hashes = hashes
+        try:
+            document = self.schema(document)
+        finally:
+            context.reset()
+        self.normalize(document, reldata)
+        return document
+
+    def normalize(self, document, reldata):
+        """
+        Sets reldata of relational structures that are empty or absent on
+        document to None.
+        """
+        base = self.base
+        for key, value in document.items():
+            if not isinstance(value, (list, dict)):
+                continue
+            struct = base.get_struct(key)
+            if not value:
+                base._normalize_reldata(reldata, struct)
+            elif struct.is_group:
+                for rel_field in struct.relational_fields:
+                    if not list(base.find(rel_field, document)):
+                        base._normalize_reldata(reldata,
+                            base.get_struct(rel_field))
+
+
+class Invalid(Exception):
+    """
+    Structural error found by NativeValidator. Its string format is the same
+    used by voluptuous, so errors don't change when engines are switched.
+    """
+
+    def __init__(self, message, path, error_type=None):
+        Exception.__init__(self, message)
+        self.path = path
+        self.error_type = error_type
+
+    def __str__(self):
+        path = ' @ data[%s]' % ']['.join(map(repr, self.path)) \
+            if self.path else ''
+        output = Exception.__str__(self)
+        if self.error_type:
+            output += ' for ' + self.error_type
+        return output + path
+
+
+class MultipleInvalid(Invalid):
+    """ List of structural errors. Reports the first one.
+    """
+
+    def __init__(self, errors):
+        Exception.__init__(self, errors)
+        self.errors = errors
+
+    @property
+    def path(self):
+        return self.errors[0].path
+
+    def __str__(self):
+        return str(self.errors[0])
+
+
+class NativeValidator(object):
+    """
+    Document validator built from base structures. Walks each document once
+    checking datatypes and required structures while collecting files and
+    relational data, without going through voluptuous. Errors match the ones
+    given by CompiledSchema.
+    """
+
+    def __init__(self, base):
+
+        # @property context: ValidationContext shared by all datatypes of
+        # this validator.
+        self.context = ValidationContext()
+
+        # @property version: Base content version this validator was built
+        # for.
+        self.version = base.content.__version__
+
+        # @property base: Base object.
+        self.base = base
+
+        # @property relnames: Dictionary at the format {structure name: list
+        # of relational field names}, for top level structures holding
+        # relational fields.
+        self.relnames = { }
+        for struct in base.content:
+            if struct.is_group and struct.relational_fields:
+                self.relnames[struct.metadata.name] = list(
+                    struct.relational_fields)
+            elif struct.is_field and struct.is_rel:
+                self.relnames[struct.name] = [struct.name]
+
+        # @property nodes: Compiled validators by normalized path. See
+        # index.StructIndex.
+        self.nodes = { }
+
+        # @property root: Compiled validator for document root.
+        self.root = self._compile_content(base.content, ())
+
+    def __call__(self, document, id, reldata, files, hashes=None):
+        """
+        Validates document, writing relational data into @param reldata and
+        file ids into @param files.
+        @param hashes: List where deferred password hashes are put. See
+        ValidationContext.
+        @return: Validated document.
+        """
+        context = self.context
+        context.id = id
+        context.reldata = reldata
+        context.files = files
+        context.hashes = hashes
+        try:
+            document = self.root([], document)
+            found = context.found
+        except MultipleInvalid:
+            raise
+        except Invalid as e:
+            raise MultipleInvalid([e])
+        finally:
+            context.reset()
+        self.normalize(document, reldata, found)
+        return document
+
+    def validate_path(self, path, value, id, reldata, files):
+        """
+        Validates a single subtree of a document, writing relational data
+        into @param reldata and file ids into @param files.
+        @param path: List of keys and indices that locate @param value in
+        document.
+        @return: Validated value.
+        """
+        node = self.nodes[tuple('*' if isinstance(item, int) else item
+            for item in path)]
+        context = self.context
+        context.id = id
+        context.reldata = reldata
+        context.files = files
+        try:
+            return node(list(path), value)
+        except MultipleInvalid:
+            raise
+        except Invalid as e:
+            raise MultipleInvalid([e])
+        finally:
+            context.reset()
+
+    def normalize(self, document, reldata, found):
+        """
+        Sets reldata of relational structures that are empty or absent on
+        document to None.
+        @param found: Relational structure names found while validating.
+        """
+        for key, relnames in self.relnames.items():
+            value = document.get(key)
+            if not isinstance(value, (list, dict)):
+                continue
+            for relname in relnames:
+                if not value or relname not in found:
+                    reldata[relname] = None
+
+    def _compile_content(self, content, prefix):
+        """ Compile structures of content into a mapping validator.
+        @param prefix: Normalized path of content.
+        """
+        nodes = { }
+        relkeys = set()
+        for struct in content:
+            if struct.is_field:
+                structname = struct.name
+                node = self._compile_datatype(struct._datatype.__schema__(
+                    self.base, struct, None, self.context))
+                multivalued = struct.multivalued
+                if struct.is_rel:
+                    relkeys.add(structname)
+            else:
+                structname = struct.metadata.name
+                multivalued = struct.metadata.multivalued
+                path = prefix + (structname,)
+                node = self._compile_content(struct.content,
+                    path + ('*',) if multivalued else path)
+            path = prefix + (structname,)
+            if multivalued:
+                self.nodes[path + ('*',)] = node
+                node = self._compile_list(node)
+            nodes[structname] = self.nodes[path] = node
+        return self._compile_mapping(nodes, content.__rnames__, relkeys)
+
+    def _compile_mapping(self, nodes, rnames, relkeys):
+        """ Validator for groups and document root.
+        """
+        context = self.context
+
+        def validate_mapping(path, data):
+            if not isinstance(data, dict):
+                raise Invalid('expected a dictionary', path)
+            out = { } if type(data) is dict else type(data)()
+            errors = [ ]
+            for key, value in data.items():
+                node = nodes.get(key)
+                if node is None:
+                    errors.append(Invalid('extra keys not allowed',
+                        path + [key]))
+                    continue
+                if key in relkeys:
+                    context.found.add(key)
+                key_path = path + [key]
+                try:
+                    out[key] = node(key_path, value)
+                except MultipleInvalid as e:
+                    inner = e.errors
+                except Invalid as e:
+                    inner = [e]
+                else:
+                    continue
+                for error in inner:
+                    if len(error.path) <= len(key_path):
+                        error.error_type = 'dictionary value'
+                    errors.append(error)
+            for rname in rnames:
+                if rname not in data:
+                    errors.append(Invalid('required key not provided',
+                        path + [rname]))
+            if errors:
+                raise MultipleInvalid(errors)
+            return out
+        return validate_mapping
+
+    def _compile_list(self, node):
+        """ Validator for multivalued structures.
+        """
+        def validate_list(path, data):
+            if not isinstance(data, list):
+                raise Invalid('expected a list', path)
+            out = [ ]
+            errors = [ ]
+            for index, value in enumerate(data):
+                index_path = path + [index]
+                try:
+                    out.append(node(index_path, value))
+                except Invalid as e:
+                    if len(e.path) > len(index_path):
+                        raise
+                    errors.append(Invalid('invalid list value', index_path))
+            if errors:
+                raise MultipleInvalid(errors)
+            if type(data) is not list:
+                return type(data)(out)
+            return out
+        return validate_list
+
+    def _compile_datatype(self, datatype):
+        """ Validator for field values.
+        """
+        def validate_datatype(path, data):
+            try:
+                return datatype(data, path)
+            except ValueError:
+                raise Invalid('not a valid value', path)
+        return validate_datatype
+
+
+# @property VALIDATORS: Validation engines available to Base.validate.
+VALIDATORS = {
+    'native': NativeValidator,
+    'voluptuous': CompiledSchema,
+}
@@ -4,31 +4,428 @@ import copy
 import jsonpath_rw
 from datetime import datetime
 from liblightbase import lbutils
+from liblightbase.lbutils.const import PYSTR
 from liblightbase.lbdoc.treetypes import Object
 from liblightbase.lbdoc.treetypes import Array
 
+# @property JPATH_CACHE: Compiled jsonpath expressions shared by all
+# DocumentTree objects, at the format {lbpath tuple: expression}. See
+# @method jpath_cache_info().
+JPATH_CACHE = lbutils.LRUStore(1024)
+
+
+def jpath_cache_info():
+    """ @return: Hits, misses and size of compiled jsonpath expressions cache.
+    """
+    return JPATH_CACHE.info()
+
+# Elements of lbpaths handled by the native resolver. Other paths are
+# handled by jsonpath_rw.
+LBPATH_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+LBPATH_INDEX = re.compile(r'^[0-9]+$')
+
+
+def compile_lbpath(lbpath):
+    """
+    @param lbpath: List of nodes, like ['grupo', '3', 'campo'] or
+    ['grupo', '*', 'campo'].
+    @return: Tuple of steps: names, integer indices and '*'; or None if
+    lbpath is outside the grammar of the native resolver.
+    """
+    steps = [ ]
+    for node in lbpath:
+        if node == '*' or LBPATH_NAME.match(node):
+            steps.append(node)
+        elif LBPATH_INDEX.match(node):
+            steps.append(int(node))
+        else:
+            return None
+    return tuple(steps) if steps else None
+
+
+class PathMatch(object):
+    """
+    Match found by the native resolver. Has the attributes of jsonpath_rw
+    matches used by path callbacks.
+    """
+
+    __slots__ = ['value', 'lbpath']
+
+    def __init__(self, value, lbpath):
+
+        # @property value: Value found.
+        self.value = value
+
+        # @property lbpath: Tuple of names and integer indices locating
+        # value on document.
+        self.lbpath = lbpath
+
+    @property
+    def full_path(self):
+        """ @property full_path: Path in jsonpath_rw notation.
+        """
+        return '.'.join('[%i]' % node if isinstance(node, int) else node
+            for node in self.lbpath)
+
+
+def resolve(root, steps, getitem=None):
+    """
+    Find values located by steps, the same way jsonpath_rw does.
+    @param root: Document tree root.
+    @param steps: Steps given by compile_lbpath().
+    @param getitem: Function (node, key, path) used to read nodes, where
+    path locates node. Defaults to node[key].
+    @return: List of PathMatch objects.
+    """
+    if getitem is None:
+        getitem = lambda node, key, path: node[key]
+    nodes = [(root, ())]
+    for step in steps:
+        found = [ ]
+        for value, path in nodes:
+            if step == '*':
+                # jsonpath_rw puts single values in a one element list
+                if isinstance(value, (dict, int, PYSTR)):
+                    value = [value]
+                for index in range(len(value)):
+                    found.append((value[index], path + (index,)))
+            elif isinstance(step, int):
+                if len(value) > step:
+                    found.append((getitem(value, step, path),
+                        path + (step,)))
+            else:
+                try:
+                    found.append((getitem(value, step, path),
+                        path + (step,)))
+                except (TypeError, KeyError, AttributeError):
+                    pass
+        nodes = found
+    return [PathMatch(value, path) for value, path in nodes]
+
+# Types whose values are used as they are on fingerprints.
+SCALARS = (PYSTR, int, float, type(None))
+
+
+def fingerprint(value):
+    """ 
+    Hashable digest of a JSON value, taken from its first level. Equal values
+    have equal fingerprints. Different values may share one, so values with
+    the same fingerprint must still be compared.
+    """
+    if isinstance(value, dict):
+        return frozenset(item if isinstance(item[1], SCALARS) else item[0]
+            for item in value.items())
+    if isinstance(value, list):
+        return tuple(item if isinstance(item, SCALARS) else
+            type(item).__name__ for item in value)
+    if isinstance(value, SCALARS):
+        return value
+    return type(value).__name__
+
+
+def merge_fingerprint(value, merge_key=None):
+    """ Fingerprint used by DocumentTree.merge_list().
+    """
+    if merge_key is not None and isinstance(value, dict) and \
+            merge_key in value:
+        return ('key', fingerprint(value[merge_key]))
+    return ('value', fingerprint(value))
+
+
+class ManualListPlan(object):
+    """
+    Changes to apply to a list, given by DocumentTree.plan_manual_list().
+    Positions refer to the list before any change.
+    """
+
+    def __init__(self):
+
+        # @property sets: Dictionary at the format {position: list of values
+        # or nested ManualListPlan objects}.
+        self.sets = { }
+
+        # @property removed: Set of positions to remove.
+        self.removed = set()
+
+        # @property inserts: Dictionary at the format {position: list of
+        # ManualListItem objects to insert before it}. Items added at the
+        # end of the list are on position len(list).
+        self.inserts = { }
+
+
+class ManualListItem(object):
+    """
+    Value added to a list by a list descriptor.
+    """
+
+    def __init__(self, value):
+
+        # @property value: Value given on descriptor.
+        self.value = value
+
+        # @property sets: List of values or nested ManualListPlan objects
+        # to update value with.
+        self.sets = [ ]
+
+
+class ManualListPositions(object):
+    """
+    Translates positions on a list being changed by list descriptors to
+    positions on ManualListPlan. Slot 2 * i holds the items inserted before
+    position i, and slot 2 * i + 1 holds the item at position i, if not
+    removed. A Fenwick tree counts items on slots, so each translation
+    takes O(log n). The tree is built on first use.
+    """
+
+    def __init__(self, size, plan):
+
+        # @property size: Size of the list before any change.
+        self.size = size
+
+        # @property plan: ManualListPlan being built.
+        self.plan = plan
+
+        # @property current: Size of the list as changed by the edits
+        # planned so far.
+        self.current = size
+
+        # @property tree: Fenwick tree of items on slots.
+        self.tree = None
+
+    def build(self):
+        # With one item on each odd slot, node i of the tree counts half of
+        # the slots it covers.
+        length = 2 * self.size + 1
+        self.tree = [(index & -index) // 2 for index in range(length + 1)]
+        for pos in self.plan.removed:
+            self.add(2 * pos + 1, -1)
+        for pos, items in self.plan.inserts.items():
+            self.add(2 * pos, len(items))
+
+    def add(self, slot, count):
+        """
+        Adds count to the number of items on slot.
+        """
+        if self.tree is None:
+            return
+        index = slot + 1
+        while index < len(self.tree):
+            self.tree[index] += count
+            index += index & -index
+
+    def find(self, pos):
+        """
+        Finds the item at position pos of the changed list.
+        @return: Tuple (slot, offset), where offset is the position of the
+        item among the items on slot.
+        """
+        if self.tree is None:
+            self.build()
+        tree = self.tree
+        length = len(tree)
+        index = 0
+        step = 1 << (length - 1).bit_length() - 1
+        while step:
+            if index + step < length and tree[index + step] <= pos:
+                index += step
+                pos -= tree[index]
+            step >>= 1
+        return index, pos
+
+
+# DocumentTree.manual_list() updates lists through a ManualListPlan when the
+# list size times the number of descriptors is above MANUAL_PLAN_MIN, and
+# there are more than MANUAL_PLAN_DESCRIPTORS descriptors. Building the plan
+# takes longer than moving items with list.insert and del below these limits.
+MANUAL_PLAN_MIN = 50000000
+MANUAL_PLAN_DESCRIPTORS = 500
+
+# Marks items changed by list descriptors on DocumentTree.check_manual_list().
+CHANGED = object()
+
+
+# Marks nodes kept by projection trees.
+KEEP = object()
+
+
+def projection_tree(base, nodes):
+    """ 
+    Build projection tree of structure names. Each structure is placed on its
+    path, like {'dependente': {'*': {'nome_dep': KEEP}}}. Names that are not
+    on base, like '_metadata', are kept from document root.
+    @param base: Base object.
+    @param nodes: List of structure names.
+    """
+    tree = { }
+    for node in nodes:
+        try:
+            path = base.get_struct_path(node)
+        except KeyError:
+            path = [node]
+        branch = tree
+        for name in path[:-1]:
+            branch = branch.setdefault(name, { })
+            if branch is KEEP:
+                # A parent structure is already kept
+                break
+        else:
+            branch[path[-1]] = KEEP
+    return tree
+
+
+def compile_projection_tree(tree):
+    """ 
+    Compile projection tree into a function that picks its nodes from
+    documents, without copying them.
+    @param tree: Tree given by projection_tree().
+    @return: Function (root) returning the projected document, or None if
+    no node was found.
+    """
+    keys = [(key, None if branch is KEEP else compile_projection_tree(branch))
+        for key, branch in tree.items() if key != '*']
+    entries = tree.get('*')
+    if entries is not None and entries is not KEEP:
+        entries = compile_projection_tree(entries)
+
+    def project(root):
+        if isinstance(root, dict):
+            projected = { }
+            for key, project_value in keys:
+                if key not in root:
+                    continue
+                value = dict.__getitem__(root, key)
+                if project_value is None:
+                    projected[key] = value
+                else:
+                    value = project_value(value)
+                    if value:
+                        projected[key] = value
+            return projected or None
+        elif isinstance(root, list) and entries is not None:
+            if entries is KEEP:
+                return list(root) or None
+            projected = [ ]
+            for entry in root:
+                entry = entries(entry)
+                if entry:
+                    projected.append(entry)
+            return projected or None
+    return project
+
+
+class Projection(object):
+    """ 
+    Projection of documents compiled from a select list. Compiled once by
+    Base.compile_projection(), it visits only the paths of the selected
+    structures on each document. Selected values are shared with the
+    projected document, not copied, so they must not be changed.
+    """
+
+    def __init__(self, base, select):
+
+        # @property select: List of selected structure names. '*' selects the
+        # whole document.
+        self.select = list(select)
+
+        # @property tree: Projection tree, see projection_tree().
+        self.tree = projection_tree(base, self.select)
+
+        if '*' in self.select:
+            self._project = lambda root: root
+        else:
+            self._project = compile_projection_tree(self.tree)
+
+    def __call__(self, document):
+        """ 
+        @return: Projected document, or None if no selected structure was
+        found.
+        """
+        return self._project(document)
+
+    def project_many(self, documents):
+        """ 
+        @param documents: Iterable of documents.
+        @return: Generator of projected documents.
+        """
+        project = self._project
+        for document in documents:
+            yield project(document)
+
+
+def path_sort_key(lbpath):
+    """ Sort key for concrete paths mixing names and integer indices.
+    """
+    return [(1, node, '') if isinstance(node, int) else (0, 0, node)
+        for node in lbpath]
+
 # delete path - DocumentTree() __init__(self, root, base=None, create_path=False)
 class DocumentTree():
 
-    def __init__(self, root, base=None, create_path=False):
+    def __init__(self, root, base=None, create_path=False, inplace=False):
         self.base = base
         self.create_path = create_path
 
+        # @property inplace: Work directly on @param root plain dicts and
+        # lists, instead of wrapping them into Object and Array copies.
+        # Missing structures are created only when @param create_path is
+        # set. Paths outside the native resolver grammar don't create them.
+        self.inplace = inplace
+
         # delete path - self.root
-        self.root = Object(root,
-            base=self.base,
-            create_path=self.create_path)
+        if inplace:
+            self.root = root
+        else:
+            self.root = Object(root,
+                base=self.base,
+                create_path=self.create_path)
 
-    def prune(self, root=None, nodes=[]):
+    @property
+    def document(self):
+        """ 
+        @property document: Tree as plain dicts and lists. On inplace mode it's
+        the root itself, otherwise a rebuilt copy.
+        """
+        if self.inplace:
+            return self.root
+        return self.root.todict()
+
+    def getitem(self, branch, key, path=()):
+        """ 
+        Inplace mode version of Object.__getitem__: returns branch[key],
+        creating missing structure when @property create_path is set.
+        @param path: Nodes locating branch. As Array doesn't wrap its
+        elements into Object, structures are not created inside them.
+        """
+        try:
+            return branch[key]
+        except KeyError:
+            if not self.create_path or not isinstance(branch, dict) or \
+                    any(isinstance(node, int) for node in path):
+                raise KeyError('Field %s does not exist' % key)
+            struct = self.base.get_struct(key)
+            if struct.is_group:
+                multivalued = struct.metadata.multivalued
+            else:
+                multivalued = struct.multivalued
+            item = branch[key] = [ ] if multivalued else { }
+            return item
+
+    def prune(self, root=None, nodes=[], share=False):
         """ 
         @param root: Tree structure to prune 
         @param nodes: Nodes to keep after pruning (all other nodes will be 
         removed)
+        @param share: Go straight to the nodes following their structure
+        paths, see projection_tree(). Kept values are shared with @param
+        root, not copied, so they must not be changed.
         @return: New tree structure pruned, or None, if no node was pruned.
         """
         if root is None:
             root = self.root
 
+        if share:
+            return Projection(self.base, nodes)(root)
+
         if isinstance(root, dict):
             retVal = {}
             for key in root:
@@ -60,8 +457,7 @@ class DocumentTree():
         @ param path: List of nodes that indicates where to get the value.
         @ returns value contained in Tree indicated by path.
         """
-        jpath = self.lbpath2jpath(path)
-        matches = jpath.find(self.root)
+        matches = self.find(path)
         if len(matches) == 1:
             return matches[0].value
         elif len(matches) > 1:
@@ -76,17 +472,48 @@ class DocumentTree():
             raise IndexError('Could not find any matches for index -> %s' %
                 '/'.join(path))
 
+    def find(self, path):
+        """
+        @param path: List of nodes.
+        @return: List of matches. Each match has the value found and its
+        full_path. Simple paths are resolved natively, other ones by
+        jsonpath_rw.
+        """
+        steps = compile_lbpath(path)
+        if steps is None:
+            return self.lbpath2jpath(path).find(self.root)
+        if self.inplace:
+            return resolve(self.root, steps, self.getitem)
+        return resolve(self.root, steps)
+
+    def match2lbpath(self, match):
+        """ @return: List of nodes locating match on document.
+        """
+        if isinstance(match, PathMatch):
+            return list(match.lbpath)
+        return self.jpath2lbpath(str(match.full_path))
+
+    def leaf_struct(self, path):
+        """ 
+        @param path: List of nodes.
+        @return: Structure of the last node of path.
+        """
+        entry = self.base.get_path_struct(path)
+        if entry is not None:
+            return entry.struct
+        node = self.toint(path[-1])
+        if isinstance(node, int) and len(path) > 1:
+            node = path[-2]
+        return self.base.get_struct(node)
+
     def insert_on_leaf(self, branch, path, value):
-        parent = None
         for ipath, node in enumerate(path):
             node = self.toint(node)
             if ipath == len(path) - 1:
-                sname = parent if isinstance(node, int) else node
                 value = self.str2lbtype(node,
-                    self.base.get_struct(sname),
+                    self.leaf_struct(path),
                     value)
                 break
-            parent = node
             branch = branch[node]
         try:
             branch[node].append(value)
@@ -104,14 +531,13 @@ class DocumentTree():
         then the value may be a JSON value.
         @ returns tree structure.
         """
-        jpath = self.lbpath2jpath(path)
-        matches = jpath.find(self.root)
+        matches = self.find(path)
         if len(matches) > 0:
             for match in matches:
                 ok, value = fn(match)
                 if not ok:
                     continue
-                lbpath = self.jpath2lbpath(str(match.full_path))
+                lbpath = self.match2lbpath(match)
                 self.insert_on_leaf(self.root, lbpath, value)
         else:
             raise IndexError('Could not find any matches for index -> %s' %
@@ -119,17 +545,14 @@ class DocumentTree():
         return self.root
 
     def update_leaf(self, branch, path, value):
-        parent = None
         for ipath, node in enumerate(path):
             node = self.toint(node)
             if ipath == len(path) - 1:
-                sname = parent if isinstance(node, int) else node
                 value = self.str2lbtype(node,
-                    self.base.get_struct(sname),
+                    self.leaf_struct(path),
                     value, 'put')
                 break
             branch = branch[node]
-            parent = node
         branch[node] = value
 
     def put_path(self, path, fn):
@@ -154,15 +577,17 @@ class DocumentTree():
         if path == ['', '']:
             path = ['$']
 
-        jpath = self.lbpath2jpath(path)
-        matches = jpath.find(self.root)
+        matches = self.find(path)
         if len(matches) > 0:
             for match in matches:
                 ok, value = fn(match)
                 if not ok:
                     continue
-                lbpath = self.jpath2lbpath(str(match.full_path))
-                if lbpath == ['$']:
+                lbpath = self.match2lbpath(match)
+                if lbpath == ['$'] and self.inplace:
+                    self.root.clear()
+                    self.root.update(value)
+                elif lbpath == ['$']:
                     self.root = Object(value,
                                        base=self.base,
                                        create_path=self.create_path)
@@ -180,18 +605,15 @@ class DocumentTree():
         it with 'value'. Only fields present in 'value' will be changed.
         Everything else in path remains the same.
         """
-        parent = None
         node = ''
         for ipath, node in enumerate(path):
             node = self.toint(node)
             if ipath == len(path) - 1:
-                sname = parent if isinstance(node, int) else node
                 value = self.str2lbtype(node,
-                    self.base.get_struct(sname),
+                    self.leaf_struct(path),
                     value, 'patch')
                 break
             branch = branch[node]
-            parent = node
 
         self.patch_leaf_rec(branch, node, value)
 
@@ -245,14 +667,13 @@ class DocumentTree():
         if path == ['', '']:
             path = ['$']
 
-        jpath = self.lbpath2jpath(path)
-        matches = jpath.find(self.root)
+        matches = self.find(path)
         if len(matches) > 0:
             for match in matches:
                 ok, value = fn(match)
                 if not ok:
                     continue
-                lbpath = self.jpath2lbpath(str(match.full_path))
+                lbpath = self.match2lbpath(match)
                 if lbpath == ['$']:
                     lbpath = []
                 self.patch_leaf(self.root, lbpath, value)
@@ -262,30 +683,28 @@ class DocumentTree():
 
         return self.root
 
-    def merge_leaf(self, branch, path, value):
+    def merge_leaf(self, branch, path, value, merge_key=None):
         """
         Traverses the object tree through path then partially updates
         it with 'value'. Only fields present in 'value' will be changed.
         Everything else in path remains the same.
+        @param merge_key: See merge_list().
         """
-        parent = None
         node = ''
         for ipath, node in enumerate(path):
             node = self.toint(node)
             if ipath == len(path) - 1:
-                sname = parent if isinstance(node, int) else node
                 value = self.str2lbtype(node,
-                    self.base.get_struct(sname),
+                    self.leaf_struct(path),
                     value, 'patch')
                 break
             branch = branch[node]
-            parent = node
 
-        self.merge_leaf_rec(branch, node, value)
+        self.merge_leaf_rec(branch, node, value, merge_key)
 
         return self.root
 
-    def merge_leaf_rec(self, branch, node, new_value):
+    def merge_leaf_rec(self, branch, node, new_value, merge_key=None):
         """
         Recursily updates a branch and its leafs with values in 'new_value'
         Manual mode
@@ -293,7 +712,8 @@ class DocumentTree():
         if node == '':
             if isinstance(new_value, dict):
                 for key, value in new_value.items():
-                    self.merge_leaf_rec(branch, key, new_value[key])
+                    self.merge_leaf_rec(branch, key, new_value[key],
+                        merge_key)
             else:
                 # TODO: ERROR -> root must always be dict
                 pass
@@ -302,23 +722,51 @@ class DocumentTree():
         else:
             if isinstance(new_value, dict):
                 for key, value in new_value.items():
-                    self.merge_leaf_rec(branch[node], key, new_value[key])
+                    self.merge_leaf_rec(branch[node], key, new_value[key],
+                        merge_key)
             elif isinstance(new_value, list):
-                for idx, item in enumerate(new_value):
-                    if item not in branch[node]:
-                        branch[node].append(item)
+                self.merge_list(branch[node], new_value, merge_key)
             else:
                 branch[node] = new_value
 
-    def merge_path(self, path, fn):
+    def merge_list(self, doc_list, new_list, merge_key=None):
+        """
+        Appends to doc_list the elements of new_list not present on it.
+        Elements are indexed by fingerprint, so each one is only compared to
+        the few elements sharing its fingerprint.
+        @param merge_key: Field name. Group elements having this field are
+        present when some element has the same value for it.
+        """
+        index = { }
+        for element in doc_list:
+            index.setdefault(merge_fingerprint(element, merge_key),
+                [ ]).append(element)
+        for item in new_list:
+            fp = merge_fingerprint(item, merge_key)
+            bucket = index.setdefault(fp, [ ])
+            if fp[0] == 'key':
+                present = any(element[merge_key] == item[merge_key]
+                    for element in bucket)
+            else:
+                present = item in bucket
+            if not present:
+                doc_list.append(item)
+                bucket.append(item)
+
+    def merge_path(self, path, fn, merge_key=None):
         """
         This method traverse the tree object following the path, until
         it ends, then patches the value to @value.
         @ param path: List of nodes that indicates where to put the value.
         @ param value: The value to update. If the current struct is a group
         then the value may be a JSON value.
+        @ param merge_key: Field name identifying group elements on lists.
+        See merge_list().
         @ returns tree structure.
         """
+        if merge_key is not None:
+            self.base.get_struct(merge_key)
+
         # Special treatment for metadata
         if path == ['_metadata', 'dt_idx']:
             actual_value = self.root['_metadata']['dt_idx']
@@ -332,17 +780,16 @@ class DocumentTree():
         if path == ['', '']:
             path = ['$']
 
-        jpath = self.lbpath2jpath(path)
-        matches = jpath.find(self.root)
+        matches = self.find(path)
         if len(matches) > 0:
             for match in matches:
                 ok, value = fn(match)
                 if not ok:
                     continue
-                lbpath = self.jpath2lbpath(str(match.full_path))
+                lbpath = self.match2lbpath(match)
                 if lbpath == ['$']:
                     lbpath = []
-                self.merge_leaf(self.root, lbpath, value)
+                self.merge_leaf(self.root, lbpath, value, merge_key)
         else:
             raise IndexError('Could not find any matches for index -> %s' %
                 '/'.join(path))
@@ -355,18 +802,15 @@ class DocumentTree():
         it with 'value'. Only fields present in 'value' will be changed.
         Everything else in path remains the same.
         """
-        parent = None
         node = ''
         for ipath, node in enumerate(path):
             node = self.toint(node)
             if ipath == len(path) - 1:
-                sname = parent if isinstance(node, int) else node
                 value = self.str2lbtype(node,
-                    self.base.get_struct(sname),
+                    self.leaf_struct(path),
                     value, 'patch')
                 break
             branch = branch[node]
-            parent = node
 
         self.manual_leaf_rec(branch, node, value)
 
@@ -423,14 +867,13 @@ class DocumentTree():
         if path == ['', '']:
             path = ['$']
 
-        jpath = self.lbpath2jpath(path)
-        matches = jpath.find(self.root)
+        matches = self.find(path)
         if len(matches) > 0:
             for match in matches:
                 ok, value = fn(match)
                 if not ok:
                     continue
-                lbpath = self.jpath2lbpath(str(match.full_path))
+                lbpath = self.match2lbpath(match)
                 if lbpath == ['$']:
                     lbpath = []
                 self.manual_leaf(self.root, lbpath, value)
@@ -464,86 +907,215 @@ class DocumentTree():
         """
         Updates doc_list using descriptors contained in update_doc_list.
         See is_list_descriptor() for a list of possible descriptors.
+        Descriptors are applied in order, each one to doc_list as the
+        previous ones left it. Descriptors are checked before doc_list is
+        changed. Small updates are then applied one at a time, larger ones
+        through plan_manual_list().
         """
-        valid_descriptors = {
-            "$set": self.manual_list_set,
-            "$add": self.manual_list_add,
-            "$remove": self.manual_list_remove,
-            "$multi": self.manual_list_multi
-        }
+        if len(update_doc_list) <= MANUAL_PLAN_DESCRIPTORS or \
+                len(doc_list) * len(update_doc_list) <= MANUAL_PLAN_MIN:
+            edits = self.check_manual_list(doc_list, update_doc_list)
+            self.apply_manual_edits(doc_list, edits)
+        else:
+            plan = self.plan_manual_list(doc_list, update_doc_list)
+            self.apply_manual_plan(doc_list, plan)
+
+    def manual_edits(self, update_doc_list, size):
+        """
+        Reads descriptors, checking positions against the size of the list
+        as the previous descriptors leave it.
+        @param size: Size of the list before any change.
+        @return: Generator of edits at the formats ('set', position, value,
+        descriptor key), ('add', position, value) and ('remove', position).
+        @raise KeyError: On unknown descriptor command.
+        @raise ValueError: On malformed descriptor.
+        @raise IndexError: On positions out of the list.
+        """
+        def position(args, command, limit):
+            try:
+                pos = int(args[0])
+            except (IndexError, ValueError):
+                raise ValueError('%s: position must be an integer' % command)
+            if pos < 0 or pos > limit:
+                raise IndexError('%s: position %d out of list of size %d' % (
+                    command, pos, size))
+            return pos
 
         for descriptor in update_doc_list:
+            if not isinstance(descriptor, dict):
+                raise ValueError('%r: invalid list descriptor' % (descriptor,))
             for key, value in descriptor.items():
                 args = key.split("#")
                 command = args[0]
                 args = args[1:]
 
-                command_func = valid_descriptors.get(command, None)
-                if command_func is None:
-                    # TODO: ERROR invalid command
+                if command == '$set':
+                    yield ('set', position(args, key, size - 1), value, key)
+                elif command == '$add':
+                    pos = position(args, key, size) if args else size
+                    yield ('add', pos, value)
+                    size += 1
+                elif command == '$remove':
+                    if not args and size == 0:
+                        raise IndexError('%s: list is empty' % key)
+                    pos = position(args, key, size - 1) if args else size - 1
+                    yield ('remove', pos)
+                    size -= 1
+                elif command == '$multi':
+                    if len(args) < 2 or not isinstance(value, list):
+                        raise ValueError('%s: expected start and end '
+                            'positions and a list of values' % key)
+                    start = position(args, key, float('inf'))
+                    end = position(args[1:], key, float('inf'))
+                    if end - start + 1 != len(value):
+                        raise ValueError('%s: expected %d values, found %d' % (
+                            key, end - start + 1, len(value)))
+                    for pos, item in zip(range(start, end + 1), value):
+                        if pos < size:
+                            yield ('set', pos, item, key)
+                        else:
+                            yield ('add', size, item)
+                            size += 1
+                else:
                     raise KeyError(command + ': invalid list decriptor')
 
-                command_func(doc_list, value, *args)
-
-    def manual_list_set(self, doc_list, value, *args):
-        # TODO: check args size, check if it's int
-        pos = int(args[0])
-        if (len(doc_list) > pos):
-            if isinstance(value, list) and self.is_list_descriptor(value):
-                self.manual_list(doc_list[pos], value)
+    def check_manual_list(self, doc_list, update_doc_list):
+        """
+        Checks descriptors. Nested descriptors are checked the same way as
+        on plan_manual_list(), following changes on a copy of doc_list.
+        @return: List of edits given by manual_edits().
+        """
+        edits = list(self.manual_edits(update_doc_list, len(doc_list)))
+        if not any(edit[0] == 'set' and isinstance(edit[2], list) and
+                self.is_list_descriptor(edit[2]) for edit in edits):
+            return edits
+        items = list(doc_list)
+        for edit in edits:
+            if edit[0] == 'add':
+                items.insert(edit[1], edit[2])
+            elif edit[0] == 'remove':
+                del items[edit[1]]
             else:
-                self.manual_leaf_rec(doc_list, pos, value)
-        else:
-            # TODO: ERROR position doesn't exist
-            pass
-
-    def manual_list_add(self, doc_list, value, *args):
-        if len(args) > 0:
-            # TODO: check if its int
-            pos = int(args[0])
-            doc_list.insert(pos, value)
-        else:
-            # append to the end of list
-            doc_list.append(value)
-
-    def manual_list_remove(self, doc_list, value, *args):
-        if len(args) > 0:
-            # TODO: check if its int
-            pos = int(args[0])
-            del doc_list[pos]
-        else:
-            # remove last
-            doc_list.pop()
-
-    def manual_list_multi(self, doc_list, value, *args):
-        if len(args) > 1 and isinstance(value, list):
-            pos_start = int(args[0])
-            pos_end = int(args[1])
-                        
-            num_elements = pos_end - pos_start + 1
-            if num_elements != len(value):
-                # TODO ERROR
-                pass
-
-            current_pos = pos_start
+                _, pos, value, command = edit
+                if isinstance(value, list) and self.is_list_descriptor(value) \
+                        and items[pos] is not CHANGED:
+                    if not isinstance(items[pos], list):
+                        raise ValueError('%s: position %d is not a list' % (
+                            command, pos))
+                    self.check_manual_list(items[pos], value)
+                items[pos] = CHANGED
+        return edits
+
+    def apply_manual_edits(self, doc_list, edits):
+        """
+        Updates doc_list with edits given by check_manual_list(), one at a
+        time.
+        """
+        for edit in edits:
+            if edit[0] == 'add':
+                doc_list.insert(edit[1], edit[2])
+            elif edit[0] == 'remove':
+                del doc_list[edit[1]]
+            else:
+                self.manual_leaf_rec(doc_list, edit[1], edit[2])
 
-            for i in range(0, num_elements):
-                if (len(doc_list) > current_pos):
-                    if isinstance(value[i], dict):
-                        self.update_dict(doc_list[current_pos], value[i])
-                    elif isinstance(value[i], list) and self.is_list_descriptor(value[i]):
-                        self.update_list(doc_list[current_pos], value[i])
+    def plan_manual_list(self, doc_list, update_doc_list):
+        """
+        Checks descriptors and translates their positions to positions on
+        doc_list.
+        @return: ManualListPlan object.
+        @raise KeyError: On unknown descriptor command.
+        @raise ValueError: On malformed descriptor.
+        @raise IndexError: On positions out of the list.
+        """
+        plan = ManualListPlan()
+        size = len(doc_list)
+        positions = ManualListPositions(size, plan)
+
+        for edit in self.manual_edits(update_doc_list, size):
+            if edit[0] == 'add':
+                item = ManualListItem(edit[2])
+                if edit[1] == positions.current:
+                    plan.inserts.setdefault(size, [ ]).append(item)
+                    positions.add(2 * size, 1)
+                else:
+                    slot, offset = positions.find(edit[1])
+                    items = plan.inserts.setdefault(slot // 2, [ ])
+                    if slot % 2:
+                        items.append(item)
                     else:
-                        doc_list[current_pos] = value[i]
+                        items.insert(offset, item)
+                    positions.add(slot - slot % 2, 1)
+                positions.current += 1
+            elif edit[0] == 'remove':
+                slot, offset = positions.find(edit[1])
+                if slot % 2:
+                    plan.removed.add(slot // 2)
+                else:
+                    del plan.inserts[slot // 2][offset]
+                positions.add(slot, -1)
+                positions.current -= 1
+            else:
+                _, pos, value, command = edit
+                slot, offset = positions.find(pos)
+                if slot % 2:
+                    sets = plan.sets.setdefault(slot // 2, [ ])
+                    target = doc_list[slot // 2]
                 else:
-                    # TODO: add to end or fail?
-                    # adding to the end
-                    doc_list.append(value[i])
+                    item = plan.inserts[slot // 2][offset]
+                    sets = item.sets
+                    target = item.value
+                # Nested descriptors are checked against the item unless it
+                # was already changed, then they are applied as they come.
+                if isinstance(value, list) and \
+                        self.is_list_descriptor(value) and not sets:
+                    if not isinstance(target, list):
+                        raise ValueError('%s: position %d is not a list' % (
+                            command, pos))
+                    value = self.plan_manual_list(target, value)
+                sets.append(value)
+        return plan
+
+    def apply_manual_plan(self, doc_list, plan):
+        """
+        Updates doc_list following plan given by plan_manual_list(), building
+        it again in a single pass.
+        """
+        for pos, values in plan.sets.items():
+            if pos not in plan.removed:
+                self.apply_manual_sets(doc_list, pos, values)
+        size = len(doc_list)
+        if not plan.removed and all(pos == size for pos in plan.inserts):
+            doc_list.extend(map(self.manual_item, plan.inserts.get(size, ())))
+            return
+        # Copy slices between changed positions.
+        new_list = [ ]
+        start = 0
+        for pos in sorted(plan.removed.union(plan.inserts)):
+            new_list.extend(doc_list[start:pos])
+            new_list.extend(map(self.manual_item, plan.inserts.get(pos, ())))
+            start = pos + 1 if pos in plan.removed else pos
+        new_list.extend(doc_list[start:])
+        doc_list[:] = new_list
+
+    def apply_manual_sets(self, doc_list, pos, values):
+        """
+        Updates position pos of doc_list with values, which may be nested
+        ManualListPlan objects.
+        """
+        for value in values:
+            if isinstance(value, ManualListPlan):
+                self.apply_manual_plan(doc_list[pos], value)
+            else:
+                self.manual_leaf_rec(doc_list, pos, value)
 
-                current_pos += 1
-        else:
-            # TODO: ERROR
-            pass
+    def manual_item(self, item):
+        """
+        @return: Value of ManualListItem item, updated with its sets.
+        """
+        holder = [item.value]
+        self.apply_manual_sets(holder, 0, item.sets)
+        return holder[0]
 
     # delete path - delete_leaf(self, branch, path)
     def delete_leaf(self, branch, path):
@@ -562,8 +1134,7 @@ class DocumentTree():
         @ param path: List of nodes that indicates where to put the value.
         @ returns tree structure.
         """
-        jpath = self.lbpath2jpath(path)
-        matches = jpath.find(self.root)
+        matches = self.find(path)
 
         # TODO: Pq esse troço tah aki? Quem usa?
         def keyfunc(match):
@@ -582,13 +1153,59 @@ class DocumentTree():
                 ok = fn(match)
                 if not ok:
                     continue
-                lbpath = self.jpath2lbpath(str(match.full_path))
+                lbpath = self.match2lbpath(match)
                 self.delete_leaf(self.root, lbpath)
         else:
             raise IndexError('Could not find any matches for index -> %s' %
                 '/'.join(path))
         return self.root
 
+    def delete_paths(self, paths):
+        """ 
+        Deletes values at many paths at once. All paths are resolved before
+        any deletion, then values are deleted in descending path order, so
+        indices on paths don't shift.
+        @param paths: List of (path, fn) tuples, as used by delete_path().
+        @returns tree structure.
+        """
+        lbpaths = set()
+        for path, fn in paths:
+            lbpaths.update(self.find_deletes(path, fn))
+        return self.delete_lbpaths(lbpaths)
+
+    def find_deletes(self, path, fn):
+        """ 
+        Resolves path of a delete without changing the tree. Missing
+        structures are not created.
+        @param path: List of nodes, as used by delete_path().
+        @param fn: Callback called with each match, returning True if it is
+        to be deleted.
+        @returns List of paths of values to delete, as tuples of nodes. See
+        delete_lbpaths().
+        """
+        create_path = self.create_path
+        self.create_path = False
+        try:
+            matches = self.find(path)
+        finally:
+            self.create_path = create_path
+        if len(matches) == 0:
+            raise IndexError('Could not find any matches for index -> %s'
+                % '/'.join(path))
+        return [tuple(self.toint(node) for node in self.match2lbpath(match))
+            for match in matches if fn(match)]
+
+    def delete_lbpaths(self, lbpaths):
+        """ 
+        Deletes values at paths given by find_deletes(), in descending path
+        order, so indices on paths don't shift.
+        @param lbpaths: Set of paths, as tuples of nodes.
+        @returns tree structure.
+        """
+        for lbpath in sorted(lbpaths, key=path_sort_key, reverse=True):
+            self.delete_leaf(self.root, lbpath)
+        return self.root
+
     def toint(self, obj):
         try: return int(obj)
         except: return obj
@@ -610,10 +1227,14 @@ class DocumentTree():
 
     # delete path - lbpath2jpath(self, lbpath)
     def lbpath2jpath(self, lbpath):
-        dot_notation = '.'.join(lbpath)
-        jpath_notation = re.sub(r'(^|\.)([0-9]+|\*)($|\.)',
-            r'[\2]\3', dot_notation)
-        return jsonpath_rw.parse(jpath_notation)
+        key = tuple(lbpath)
+        jpath = JPATH_CACHE.get(key)
+        if jpath is None:
+            dot_notation = '.'.join(lbpath)
+            jpath_notation = re.sub(r'(^|\.)([0-9]+|\*)($|\.)',
+                r'[\2]\3', dot_notation)
+            jpath = JPATH_CACHE[key] = jsonpath_rw.parse(jpath_notation)
+        return jpath
 
     # delete path - jpath2lbpath(self, jpath)
     def jpath2lbpath(self, jpath):
@@ -1,7 +1,9 @@
 #!/usr/env python
 # -*- coding: utf-8 -*-
+import threading
 from liblightbase import lbutils
 from liblightbase.lbdoc.metadata import DocumentMetadata
+from liblightbase.lbbase.validator import ValidationContext
 
 def generate_metaclass(struct, base=None):
     """ 
@@ -24,8 +26,9 @@ def generate_metaclass(struct, base=None):
         document structure model.
         """
         # @property __valreq__: Flag used to validate required
-        # fields or not.
-        __valreq__ = True
+        # fields or not, at __valreq__.value. It's thread local, as
+        # metaclasses are shared by all threads using the base.
+        __valreq__ = threading.local()
 
         # @property __slots__: reserves space for the declared 
         # variables and prevents the automatic creation of 
@@ -37,7 +40,7 @@ def generate_metaclass(struct, base=None):
         def __init__(self, **kwargs):
             """ Document MetaClass constructor
             """
-            if self.__valreq__:
+            if getattr(self.__valreq__, 'value', True):
                 lbutils.validate_required(rnames, kwargs)
             for arg in kwargs:
                 setattr(self, arg, kwargs[arg])
@@ -71,7 +74,9 @@ def generate_property(base, struct):
         return value
 
     def setter(self, value):
-        struct_metaclass = base.metaclass(structname)
+        # Read metaclass directly, as base.metaclass() would reset the
+        # required fields flag.
+        struct_metaclass = base.__metaclasses__[structname]
         if struct.is_field:
             value = struct_metaclass(value)
         elif struct.is_group:
@@ -84,8 +89,7 @@ def generate_property(base, struct):
                 assertion = all(isinstance(element, struct_metaclass) \
                     for element in value)
                 assert assertion, msg
-                value = generate_multimetaclass(struct,
-                    struct_metaclass)(value)
+                value = get_multimetaclass(struct, struct_metaclass)(value)
             else:
                 msg = '{} object should be an instance of {}'.format(
                     struct.metadata.name, struct_metaclass)
@@ -146,6 +150,52 @@ def generate_multimetaclass(struct, struct_metaclass):
 
     return MultiGroupMetaClass
 
+def get_multimetaclass(struct, struct_metaclass):
+    """ 
+    Multivalued group metaclass of @param struct_metaclass, generated once.
+    See generate_multimetaclass().
+    """
+    try:
+        return struct_metaclass.__multimetaclass__
+    except AttributeError:
+        multimetaclass = generate_multimetaclass(struct, struct_metaclass)
+        struct_metaclass.__multimetaclass__ = multimetaclass
+        return multimetaclass
+
+def trusted_document(base, dictobj, metaclass=None):
+    """
+    Build document metaclass instance from data known to be valid, like
+    documents returned by the server. Structures are put on instance slots
+    directly, without validating values or building validators.
+    @param base: Base object.
+    @param dictobj: dictionary object. It's not changed.
+    @param metaclass: GroupMetaClass in question, or None for the document
+    root.
+    """
+    metaclasses = base.__metaclasses__
+    if metaclass is None:
+        metaclass = metaclasses['__base__']
+    document = metaclass.__new__(metaclass)
+    for member, value in dictobj.items():
+        if member == '_metadata':
+            if value:
+                document._metadata = DocumentMetadata(**value)
+            continue
+        struct = base.get_struct(member)
+        struct_metaclass = metaclasses[member]
+        if struct.is_field:
+            field = struct_metaclass.__new__(struct_metaclass)
+            object.__setattr__(field, '__value__', value)
+            value = field
+        elif struct.metadata.multivalued:
+            value = get_multimetaclass(struct, struct_metaclass)(
+                trusted_document(base, element, struct_metaclass)
+                for element in value)
+        else:
+            value = trusted_document(base, value, struct_metaclass)
+        setattr(document, '_' + member, value)
+    return document
+
 def generate_field_metaclass(field, base):
     """
     Generate field metaclass. The field metaclass 
@@ -163,7 +213,10 @@ def generate_field_metaclass(field, base):
             self.__value__ = value
 
         def __setattr__(self, obj, value):
-            validator = field._datatype.__schema__(base, field, 0)
+            # Relational data and files of metaclass values are discarded,
+            # so each assignment gets its own context.
+            validator = field._datatype.__schema__(base, field, 0,
+                ValidationContext(0, { }, [ ]))
             if field.multivalued is True:
                 msg = 'Expected type list for {}, but found {}'
                 assert isinstance(value, list), msg.format(
@@ -1,6 +1,7 @@
 
 from datetime import datetime
 from liblightbase.lbutils.const import PYSTR
+from liblightbase.lbutils.utils import parse_datetime
 
 # delete path - DocumentMetadata(object)
 class DocumentMetadata(object):
@@ -91,7 +92,7 @@ class DocumentMetadata(object):
         """ @property dt_doc setter
         """
         if isinstance(value, PYSTR):
-            value = datetime.strptime(value, '%d/%m/%Y %H:%M:%S')
+            value = parse_datetime(value)
         accepted_types = (datetime,)
         self._attr_setter('dt_doc', value, accepted_types)
 
@@ -106,7 +107,7 @@ class DocumentMetadata(object):
         """ @property dt_last_up setter
         """
         if isinstance(value, PYSTR):
-            value = datetime.strptime(value, '%d/%m/%Y %H:%M:%S')
+            value = parse_datetime(value)
         accepted_types = (datetime,)
         self._attr_setter('dt_last_up', value, accepted_types)
 
@@ -121,7 +122,7 @@ class DocumentMetadata(object):
         """ @property dt_idx setter
         """
         if isinstance(value, PYSTR):
-            value = datetime.strptime(value, '%d/%m/%Y %H:%M:%S')
+            value = parse_datetime(value)
         accepted_types = (datetime, type(None))
         self._attr_setter('dt_idx', value, accepted_types)
 
@@ -136,6 +137,6 @@ class DocumentMetadata(object):
         """ @property dt_del setter
         """
         if isinstance(value, PYSTR):
-            value = datetime.strptime(value, '%d/%m/%Y %H:%M:%S')
+            value = parse_datetime(value)
         accepted_types = (datetime, type(None))
         self._attr_setter('dt_del', value, accepted_types)
@@ -88,6 +88,9 @@ class LBRest(object):
             # Something got wrong, raise error
             raise HTTPError(response.text)
         else:
+            if kwargs.get('stream'):
+                # Body is read by the caller, as it arrives
+                return response
             # Everything is alright, return response
             return response.text
 
@@ -4,6 +4,7 @@ from liblightbase.lbutils.conv import document2json
 from liblightbase.lbutils.conv import json2document
 from liblightbase.lbbase.struct import Base
 from liblightbase.lbsearch.search import Collection
+from liblightbase.lbsearch.search import CollectionReader
 from liblightbase.lbsearch.search import Search
 from liblightbase import lbutils
 from liblightbase.lbutils.conv import dict2genericbase
@@ -44,6 +45,29 @@ class DocumentREST(LBRest):
         #return dict2genericbase(response.json())
         return dict2genericbase(lbutils.json2object(response))
 
+    def iter_collection(self, search_obj=None, format='generic',
+            chunk_size=65536):
+        """
+        Retrieves collection of documents according to search object, reading
+        results as they arrive. See lbsearch.search.CollectionReader.
+        @param search_obj: JSON which represents a search object.
+        @param format: Type of results: 'dict', 'document' or 'generic'.
+        @param chunk_size: Number of bytes read from response at a time.
+        @return: CollectionReader. Close it, or use it on a with statement,
+        to release the connection when results are not read to the end.
+        """
+        if search_obj is not None:
+            msg = 'search_obj must be a Search object.'
+            assert isinstance(search_obj, Search), msg
+        else:
+            search_obj = Search()
+        response = self.send_request(self.httpget,
+            url_path=[self.basename, self.doc_prefix],
+            params={self.search_param: search_obj._asjson()},
+            stream=True)
+        return CollectionReader(self.base, response.iter_content(chunk_size,
+            decode_unicode=True), format, response.close)
+
     def update_collection(self, search_obj=None, path_list=[]):
         """
         Updates collection of documents according to search object.
@@ -3,6 +3,7 @@
 __author__ = 'carlos'
 
 from liblightbase.lbutils.const import PYSTR
+from liblightbase.lbutils.codecs import register_encoder
 
 
 class PathOperation():
@@ -117,4 +118,6 @@ class PathOperation():
                 "mode": self.mode,
                 "fn": self.fn,
                 "args": self.args
-        }
\ No newline at end of file
+        }
+
+register_encoder(PathOperation, lambda obj: obj._encoded())
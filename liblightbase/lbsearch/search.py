@@ -1,5 +1,6 @@
 from liblightbase import lbutils
 from liblightbase.lbutils.conv import dict2document
+from liblightbase.lbutils.conv import dict2genericbase
 from liblightbase.lbutils.const import PYSTR
 
 
@@ -201,12 +202,95 @@ class FileResults(list):
 class NullDocument(object):
     pass
 
+def result2document(base, dictobj, trusted=False):
+    """
+    Convert a search result to BaseMetaClass object, or NullDocument if it's
+    None. @param dictobj isn't changed.
+    @param trusted: See dict2document().
+    """
+    if dictobj is None:
+        return NullDocument()
+    if trusted:
+        return dict2document(base, dictobj, trusted=True)
+    return dict2document(base, dict(dictobj))
+
 class Results(list):
+    """
+    Search results. Holds result dictionaries and converts each one to a
+    BaseMetaClass object when it's first indexed or iterated, keeping the
+    converted object in place of the dictionary.
+    """
+
+    def __init__(self, base, results, trusted=False):
+
+        # @property base: Base object.
+        self.base = base
+
+        # @property trusted: Results are converted without validation. See
+        # dict2document().
+        self.trusted = trusted
+
+        # @property raw: Result dictionaries, as given. Never converted.
+        self.raw = results
+
+        super(Results, self).__init__(results)
+
+    def _convert(self, index):
+        item = super(Results, self).__getitem__(index)
+        if item is None or isinstance(item, dict):
+            item = result2document(self.base, item, self.trusted)
+            super(Results, self).__setitem__(index, item)
+        return item
+
+    def _convert_all(self):
+        for index in range(len(self)):
+            self._convert(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._convert(i) for i in range(*index.indices(len(self)))]
+        return self._convert(index)
+
+    def __getslice__(self, i, j):
+        # Python 2 only
+        return self.__getitem__(slice(i, j))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._convert(index)
+
+    def __reversed__(self):
+        for index in reversed(range(len(self))):
+            yield self._convert(index)
+
+    def __contains__(self, item):
+        return any(result is item or result == item for result in self)
+
+    def __eq__(self, other):
+        self._convert_all()
+        return super(Results, self).__eq__(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._convert_all()
+        return super(Results, self).__repr__()
+
+    def pop(self, index=-1):
+        item = self._convert(index)
+        super(Results, self).pop(index)
+        return item
+
+    def index(self, item, *args):
+        self._convert_all()
+        return super(Results, self).index(item, *args)
 
-    def __init__(self, base, results):
-        results_object = [dict2document(base, dictobj) \
-            if dictobj is not None else NullDocument() for dictobj in results]
-        super(Results, self).__init__(results_object)
+    def count(self, item):
+        self._convert_all()
+        return super(Results, self).count(item)
 
 class FileCollection(object):
 
@@ -226,10 +310,12 @@ class FileCollection(object):
 
 class Collection(object):
 
-    def __init__(self, base, results, result_count, limit, offset):
+    def __init__(self, base, results, result_count, limit, offset,
+            raw=False, trusted=False):
 
-        # @property results:
-        self.results = Results(base, results)
+        # @property results: Results object, or the result dictionaries
+        # themselves if @param raw is True. See Results for @param trusted.
+        self.results = results if raw else Results(base, results, trusted)
 
         # @property result_count:
         self.result_count = result_count
@@ -239,3 +325,133 @@ class Collection(object):
 
         # @property offset:
         self.offset = offset
+
+class CollectionReader(object):
+    """
+    Collection read from a JSON stream. Results are decoded one at a time
+    while they're iterated, so the whole collection is never held in memory.
+    Collection attributes found before results on the stream are read on
+    creation. The ones found after results are read when results end; asking
+    for them earlier discards the results not iterated yet. The stream is
+    closed when it ends, on malformed JSON, or by close(), which can also be
+    called by using the reader on a with statement.
+    """
+
+    # @property formats: Functions that convert each result, by format name.
+    formats = {
+        'dict': lambda base, dictobj: dictobj,
+        'document': result2document,
+        'generic': lambda base, dictobj: dictobj if dictobj is None
+            else dict2genericbase(dictobj),
+    }
+
+    def __init__(self, base, chunks, format='document', close=None):
+        """
+        @param base: Base object.
+        @param chunks: Iterable of JSON text chunks, like requests
+        Response.iter_content().
+        @param format: Type of results yielded: 'dict' for dictionaries,
+        'document' for base metaclass instances (like Collection) or
+        'generic' for dict2genericbase objects (like
+        DocumentREST.get_collection()).
+        @param close: Function that releases the stream, like requests
+        Response.close().
+        """
+        if format not in self.formats:
+            raise ValueError('Unknown results format %s' % format)
+
+        # @property base: Base object.
+        self.base = base
+
+        # @property format: Type of results yielded.
+        self.format = format
+
+        self._close = close
+        self._stream = lbutils.JSONStreamReader(chunks)
+        self._attributes = { }
+        self._results = None
+        try:
+            self._stream.expect('{')
+            if self._stream.peek() == '}':
+                self._stream.pos += 1
+                self.close()
+            else:
+                self._state = 'key'
+                self._read_attributes()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Closes the stream. Results and attributes not read yet are
+        discarded.
+        """
+        self._state = 'end'
+        if self._close is not None:
+            close, self._close = self._close, None
+            close()
+
+    @property
+    def result_count(self):
+        return self._attribute('result_count')
+
+    @property
+    def limit(self):
+        return self._attribute('limit')
+
+    @property
+    def offset(self):
+        return self._attribute('offset')
+
+    def __iter__(self):
+        convert = self.formats[self.format]
+        for dictobj in self._raw_results():
+            yield convert(self.base, dictobj)
+
+    def _attribute(self, name):
+        if name not in self._attributes and self._state != 'end':
+            for _ in self._raw_results():
+                pass
+        return self._attributes.get(name)
+
+    def _raw_results(self):
+        """ Generator of results not read yet, as dictionaries.
+        """
+        if self._state == 'results':
+            self._results = self._stream.iter_array()
+            self._state = 'reading'
+        if self._state == 'reading':
+            try:
+                for dictobj in self._results:
+                    yield dictobj
+                    if self._state != 'reading':
+                        return
+                if self._state == 'reading':
+                    self._state = 'separator'
+                    self._read_attributes()
+            except Exception:
+                self.close()
+                raise
+
+    def _read_attributes(self):
+        """ Read collection attributes up to results or the end of stream.
+        """
+        stream = self._stream
+        while True:
+            if self._state == 'separator':
+                if stream.expect(',}') == '}':
+                    self.close()
+                    return
+            key = stream.value()
+            stream.expect(':')
+            if key == 'results':
+                self._state = 'results'
+                return
+            self._attributes[key] = stream.value()
+            self._state = 'separator'
@@ -1,19 +1,33 @@
 
 # -*- coding: utf-8 -*-
-import inspect
 import json
 from liblightbase.lbutils.exc import ValidationError
+from liblightbase.lbutils.codecs import register_encoder
 
 class BaseDataType(object):
 
     """ Base Methods for any Field
     """
-    def __init__(self, base, field, id):
+    def __init__(self, base, field, id, context=None):
         self.base = base
         self.field = field
         self.id = id
 
-    def __call__(self, value):
+        # @property context: ValidationContext holding the reldata and files
+        # sinks of the document being validated. When None, data is written
+        # to base.__reldata__[id] and base.__files__[id].
+        self.context = context
+
+        # @property is_rel: Cached field.is_rel, checked for every value.
+        self.is_rel = field.is_rel
+
+    def __call__(self, value, path=None):
+        """
+        Validates value.
+        @param path: List of keys and indices that locate value in document.
+        Schema walkers must provide it for relational fields inside 
+        multivalued structures, so reldata can be put on the right position.
+        """
         if value == '' or value == None:
             if self.field.required:
                 msg = 'Structure {}: Required value not provided.'
@@ -26,32 +40,52 @@ class BaseDataType(object):
         except Exception as e:
             raise ValidationError('Structure %s: %s' % (self.field.name, e))
 
-        if self.field.is_rel:
-            path = inspect.currentframe().f_back.f_locals.get('path', [])
-            path_indices = self._path_indices(path)
+        if self.is_rel:
+            path_indices = self._path_indices(path or [])
 
+            reldata = self._reldata
             if len(path_indices) > 0:
 
-                _rel_data = self.base.__reldata__[self.id].get(self.field.name)
+                _rel_data = reldata.get(self.field.name)
 
                 if _rel_data is not None:
                     data = self._put_data(_rel_data, path_indices, self.__obj__)
-                    self.base.__reldata__[self.id][self.field.name] = data
+                    reldata[self.field.name] = data
                 else:
                     data = self._put_data(Matrix(), path_indices, self.__obj__)
-                    self.base.__reldata__[self.id][self.field.name] = data
+                    reldata[self.field.name] = data
             else:
-                self.base.__reldata__[self.id][self.field.name] = self.__obj__
+                reldata[self.field.name] = self.__obj__
 
         return value
 
+    @property
+    def _reldata(self):
+        """ Relational data sink of the document being validated.
+        """
+        if self.context is not None:
+            return self.context.reldata
+        return self.base.__reldata__[self.id]
+
+    @property
+    def _files(self):
+        """ Files sink of the document being validated.
+        """
+        if self.context is not None:
+            return self.context.files
+        return self.base.__files__[self.id]
+
     def _put_data(self, matrix, indices, obj):
         _matrix = matrix
         for i, index in enumerate(indices):
             if i == len(indices) - 1:
                 _matrix[index] = obj
             else:
-                _matrix = _matrix[index]
+                inner = _matrix[index]
+                if inner is None:
+                    # Position cleared by Base.validate_path()
+                    inner = _matrix[index] = Matrix()
+                _matrix = inner
         return matrix
 
     def _path_indices(self, path):
@@ -83,6 +117,8 @@ class BaseDataType(object):
         return expected_types
                 
 
+register_encoder(BaseDataType, lambda obj: obj._encoded())
+
 class Matrix(list):
 
     def __setitem__(self, index, value):
@@ -133,18 +133,20 @@ class FileMask(object):
             msg = 'Invalid UUID: {}'
             raise TypeError(msg.format(str(value)))
 
+lbutils.register_encoder(FileMask, lambda obj: obj.__dict__)
+
 class FileExtension(BaseDataType):
 
     """ Represents an extension for file-based Fields
     """
-    def __init__(self, base, field, id):
-        super(FileExtension, self).__init__(base, field, id)
+    def __init__(self, base, field, id, context=None):
+        super(FileExtension, self).__init__(base, field, id, context)
 
     @staticmethod
     def cast_str(value):
         return lbutils.json2object(value)
 
-    def __call__(self, value):
+    def __call__(self, value, path=None):
         if value is None:
             return value
         try:
@@ -175,7 +177,7 @@ class FileExtension(BaseDataType):
             #     raise ValueError('Mask modified. id_file do not match file mask')
 
             filemask['id_file'] = id_file
-            self.base.__files__[self.id].append(id_file)
+            self._files.append(id_file)
             return filemask
         else:
             return filemask
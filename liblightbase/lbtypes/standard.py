@@ -4,6 +4,7 @@ from liblightbase.lbtypes.extended import FileExtension
 from liblightbase import lbutils
 from liblightbase.lbutils.const import PYSTR
 import datetime
+import re
 
 class File(FileExtension):
     """ Represents a File Field """
@@ -43,22 +44,52 @@ class Password(BaseDataType):
     __dbtype__ = 'String'
     __pytype__ = PYSTR
 
+    # @property hash_format: Format of bcrypt hashes, like
+    # '$2b$12$' + 53 characters of salt and checksum.
+    hash_format = re.compile(r'^\$2[abxy]?\$\d{2}\$[./A-Za-z0-9]{53}$')
+
     @staticmethod
     def cast_str(value):
         return value
 
+    @staticmethod
+    def hashpw(value):
+        """ Hash password with a new salt.
+        """
+        import bcrypt
+        value = bcrypt.hashpw(value.encode('utf-8'), bcrypt.gensalt())
+        return value.decode('utf-8')
+
+    def __call__(self, value, path=None):
+        # Kept for deferred hashing. See @method validate().
+        self._path = path
+        return super(Password, self).__call__(value, path)
+
     def validate(self, value):
         if value == '':
             self.__obj__ = value
-        else:
-            import bcrypt
-            value = value.encode('utf-8')
-            value = bcrypt.hashpw(value, bcrypt.gensalt())
-            value = value.decode('utf-8')
+            return value
+        if getattr(self.base, 'keep_password_hashes', False) and \
+                isinstance(value, PYSTR) and self.hash_format.match(value):
+            # Already hashed, possibly on a previous validation.
             self.__obj__ = value
-            # To validate later
-            # value == bcrypt.hashpw(password, hashed_password)
-            # will return true if the password matches
+            return value
+        executor = getattr(self.base, 'password_executor', None)
+        context = self.context
+        path = getattr(self, '_path', None)
+        if executor is not None and context is not None and \
+                context.hashes is not None and path and not self.is_rel:
+            # The hash is put on the validated document by the caller, so
+            # documents don't wait on each other. See Base.validate_many().
+            self.__obj__ = value
+            context.hashes.append((list(path),
+                executor.submit(self.hashpw, value)))
+            return value
+        value = self.hashpw(value)
+        self.__obj__ = value
+        # To validate later
+        # value == bcrypt.hashpw(password, hashed_password)
+        # will return true if the password matches
         return value
 
 class TextArea(BaseDataType):
@@ -140,7 +171,7 @@ class Date(BaseDataType):
         if value == '':
             self.__obj__ = value
         else:
-            self.__obj__ = datetime.datetime.strptime(value, '%d/%m/%Y').date()
+            self.__obj__ = lbutils.parse_date(value)
         return value
 
 class Time(BaseDataType):
@@ -156,7 +187,7 @@ class Time(BaseDataType):
         if value == '':
             self.__obj__ = value
         else:
-            self.__obj__ = datetime.datetime.strptime(value, '%H:%M:%S').time()
+            self.__obj__ = lbutils.parse_time(value)
         return value
 
 class DateTime(BaseDataType):
@@ -172,7 +203,7 @@ class DateTime(BaseDataType):
         if value == '':
             self.__obj__ = value
         else:
-            self.__obj__ = datetime.datetime.strptime(value, '%d/%m/%Y %H:%M:%S')
+            self.__obj__ = lbutils.parse_datetime(value)
         return value
 
 class Url(BaseDataType):
@@ -245,11 +276,18 @@ class Json(BaseDataType):
     __dbtype__ = 'String'
     __pytype__ = (int, bool, float, list, dict, PYSTR, type(None))
 
+    # @property max_depth: Maximum nesting of values. See lbutils.check_json.
+    max_depth = lbutils.JSON_MAX_DEPTH
+
+    # @property max_size: Maximum size of values, or None for no limit. See
+    # lbutils.check_json.
+    max_size = None
+
     @staticmethod
     def cast_str(value):
         return lbutils.json2object(value)
 
     def validate(self, value):
-        lbutils.object2json(value)
+        lbutils.check_json(value, self.max_depth, self.max_size)
         self.__obj__ = value
         return value
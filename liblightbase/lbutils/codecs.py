@@ -1,8 +1,14 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import re
 import json
+import uuid
+import codecs
+import numbers
+import inspect
 import datetime
+from liblightbase.lbutils.const import PYSTR
 
 JSON_TYPES = (
     dict,        # object
@@ -14,6 +20,64 @@ JSON_TYPES = (
 )
 
 
+# **********************************
+# * Encoders of non JSON types     *
+# **********************************
+
+# @property JSON_ENCODERS: Dictionary at the format {type: function(obj)},
+# where function converts obj to something JSON encoder can handle. Types
+# without an encoder of their own use the encoder of their closest base
+# class. See register_encoder().
+# Dates are formatted as strftime() does with formats '%d/%m/%Y %H:%M:%S',
+# '%H:%M:%S' and '%d/%m/%Y', without going through the C library.
+JSON_ENCODERS = {
+    datetime.datetime: lambda obj: '%02d/%02d/%d %02d:%02d:%02d' % (
+        obj.day, obj.month, obj.year, obj.hour, obj.minute, obj.second),
+    datetime.time: lambda obj: '%02d:%02d:%02d' % (
+        obj.hour, obj.minute, obj.second),
+    datetime.date: lambda obj: '%02d/%02d/%d' % (
+        obj.day, obj.month, obj.year),
+    uuid.UUID: str,
+}
+
+# @property _resolved_encoders: Encoder found for each type encoded so far,
+# or None when there's none.
+_resolved_encoders = { }
+
+def register_encoder(pytype, encoder):
+    """ @param pytype: Python type
+        @param encoder: Function that receives an instance of pytype (or of
+        a subclass of it) and returns something JSON encoder can handle.
+
+        This method makes object2json() use encoder for instances of pytype.
+    """
+    JSON_ENCODERS[pytype] = encoder
+    _resolved_encoders.clear()
+
+def _encoded(obj):
+    return obj._encoded()
+
+def get_encoder(pytype):
+    """ @param pytype: Python type
+        @return: Encoder registered for pytype or its closest base class. For
+        other types with an _encoded() method, a function calling it. None if
+        there's no encoder.
+    """
+    try:
+        return _resolved_encoders[pytype]
+    except KeyError:
+        pass
+    encoder = None
+    for klass in inspect.getmro(pytype):
+        if klass in JSON_ENCODERS:
+            encoder = JSON_ENCODERS[klass]
+            break
+    else:
+        if hasattr(pytype, '_encoded'):
+            encoder = _encoded
+    _resolved_encoders[pytype] = encoder
+    return encoder
+
 # ********************************** 
 # * Document default encode/decode *
 # ********************************** 
@@ -22,30 +86,84 @@ class DocumentJSONEncoder(json.JSONEncoder):
 
     def default(self, obj):
         """Convert ``obj`` to something JSON encoder can handle."""
+        encoder = get_encoder(obj.__class__)
+        if encoder is None:
+            return json.JSONEncoder.default(self, obj)
+        return encoder(obj)
+
+# ****************
+# * JSON backends *
+# ****************
+
+# @property _encoder: Encoder used by object2json() calls without options.
+_encoder = DocumentJSONEncoder(ensure_ascii=False)
+
+# @property _decoder: Decoder used by json2object() calls without options.
+_decoder = json.JSONDecoder()
+
+def _orjson_default(obj):
+    encoder = get_encoder(obj.__class__)
+    if encoder is None:
+        raise TypeError('Object of type %s is not JSON serializable' %
+            obj.__class__.__name__)
+    return encoder(obj)
+
+def _stdlib_backend():
+    return (_encoder.encode, lambda value: _decoder.raw_decode(value)[0])
+
+def _orjson_backend():
+    import orjson
+    # Dates go through JSON_ENCODERS instead of being written in RFC 3339.
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(value):
+        return orjson.dumps(value, default=_orjson_default,
+            option=option).decode('utf-8')
+    return (dumps, orjson.loads)
+
+# @property JSON_BACKENDS: Dictionary at the format {name: function}, where
+# function returns the (dumps, loads) functions of a JSON library. It raises
+# ImportError when the library isn't installed.
+JSON_BACKENDS = {
+    'json': _stdlib_backend,
+    'orjson': _orjson_backend,
+}
+
+# @property _backend: Name, dumps and loads functions of backend in use.
+_backend = ['json'] + list(_stdlib_backend())
+
+def set_json_backend(name):
+    """ @param name: Name of backend in JSON_BACKENDS, or 'auto' to use the
+        fastest one installed.
+
+        This method selects the library used by object2json() and
+        json2object(). Calls with options (like indent or ensure_ascii=True),
+        values a backend can't handle and its errors fall back to the
+        standard json library. Text written by orjson decodes to the same
+        values, except NaN and infinite floats which it writes as null, but
+        the text itself differs: it has no spaces after separators and
+        formats some floats differently, like 1e-07 as 1e-7. Callers that
+        hash or compare JSON text should pass an option, like
+        separators=(', ', ': '), to always get the standard library text.
+    """
+    if name == 'auto':
+        for name in ('orjson', 'json'):
+            try:
+                return set_json_backend(name)
+            except ImportError:
+                continue
+    try:
+        backend = JSON_BACKENDS[name]
+    except KeyError:
+        raise ValueError('Unknown JSON backend %s' % name)
+    _backend[1:] = backend()
+    _backend[0] = name
+    return name
 
-        if isinstance(obj, datetime.datetime):
-            obj = obj.strftime('%d/%m/%Y %H:%M:%S')
-        elif isinstance(obj, datetime.time):
-            obj = obj.strftime('%H:%M:%S')
-        elif isinstance(obj, datetime.date):
-            obj = obj.strftime('%d/%m/%Y')
-        else:
-
-            # NOTE: SINCERAMENTE só um SANTO para entender como esse CARALHO
-            # funciona! Passe o dia depurando essa MERDA! Por INFERÊNCIA DIVINA
-            # descobri que quando o tipo for 
-            # "<class 'liblightbase.lbutils.conv.dict2genericbase'>" então
-            # devemos retornar ".__dict__" e era aí que residia um bug!
-            # By Questor
-            if "<class 'liblightbase.lbutils.conv.dict2genericbase'>" in\
-                    str(obj.__class__):
-                obj = obj.__dict__
-            else:
-
-                # NOTE: Method to generate JSON! By Mr Who
-                obj = obj._encoded()
-
-        return obj
+def get_json_backend():
+    """ @return: Name of JSON backend in use.
+    """
+    return _backend[0]
 
 # ************************
 # * Generic JSON encoder *
@@ -62,11 +180,72 @@ def object2json(value, ensure_ascii=False, **kwargs):
         to JSON oject. 
     """
 
+    if not kwargs and not ensure_ascii:
+        if _backend[0] != 'json':
+            try:
+                return _backend[1](value)
+            except (TypeError, OverflowError):
+                # Let the standard library handle or report it.
+                pass
+        return _encoder.encode(value)
+
     return json.dumps(value,
                      ensure_ascii=ensure_ascii,
                      cls=DocumentJSONEncoder,
                      **kwargs)
 
+# ***********************
+# * JSON structure check *
+# ***********************
+
+# @property JSON_MAX_DEPTH: Default nesting limit of check_json().
+JSON_MAX_DEPTH = 512
+
+# @property JSON_KEY_TYPES: Types accepted by JSON encoder as object keys.
+JSON_KEY_TYPES = (PYSTR, int, float, bool, type(None))
+
+def check_json(value, max_depth=JSON_MAX_DEPTH, max_size=None):
+    """ @param value: Python object to check
+        @param max_depth: Maximum nesting of objects and arrays
+        @param max_size: Maximum size of value, counted as one per item plus
+        the length of strings and keys. None for no limit.
+
+        This method walks value and checks it can be converted to JSON by
+        object2json(), without building the JSON string. Values that aren't
+        JSON types, like dates, are checked by encoding them alone. Raises
+        TypeError or ValueError on the first problem found.
+    """
+    size = 0
+    stack = [(value, 0)]
+    while stack:
+        value, depth = stack.pop()
+        size += 1
+        if isinstance(value, PYSTR):
+            size += len(value)
+        elif isinstance(value, dict):
+            depth += 1
+            if max_depth is not None and depth > max_depth:
+                raise ValueError('JSON nested deeper than %d levels' %
+                    max_depth)
+            for key, item in value.items():
+                if not isinstance(key, JSON_KEY_TYPES):
+                    raise TypeError('JSON key %r is not a string' % (key,))
+                if isinstance(key, PYSTR):
+                    size += len(key)
+                stack.append((item, depth))
+        elif isinstance(value, (list, tuple)):
+            depth += 1
+            if max_depth is not None and depth > max_depth:
+                raise ValueError('JSON nested deeper than %d levels' %
+                    max_depth)
+            stack.extend((item, depth) for item in value)
+        elif not isinstance(value, JSON_TYPES):
+            # Types handled by DocumentJSONEncoder
+            object2json(value)
+        if max_size is not None and size > max_size:
+            raise ValueError('JSON larger than %d' % max_size)
+    return size
+
 # ************************ 
 # * Generic JSON decoder * 
 # ************************ 
@@ -87,8 +266,121 @@ def json2object(value, **kwargs):
         try:
             # Loads JSON and return object
             # raw_decode method is used because of compatibility problems.
-            return json.JSONDecoder(**kwargs).raw_decode(value)[0]
+            if kwargs:
+                return json.JSONDecoder(**kwargs).raw_decode(value)[0]
+            if _backend[0] != 'json' and isinstance(value, PYSTR):
+                try:
+                    return _backend[2](value)
+                except ValueError:
+                    # Trailing data, NaN and others the standard library
+                    # accepts or reports.
+                    pass
+            return _decoder.raw_decode(value)[0]
 
         except Exception as e:
             # JSON loading was not possible
             raise e.__class__('Could not parse JSON data: %s' % e)
+
+# ***********************
+# * Streaming JSON reader *
+# ***********************
+
+class JSONStreamReader(object):
+    """ Reads JSON values from a stream of text chunks, holding only the
+        chunks not read yet. Used to walk large arrays one element at a time.
+    """
+
+    # @property whitespace: JSON insignificant whitespace.
+    whitespace = re.compile(r'[ \t\n\r]*')
+
+    # @property delimiters: Characters that may follow a JSON number.
+    delimiters = (',', ']', '}', ' ', '\t', '\n', '\r')
+
+    def __init__(self, chunks):
+        """ @param chunks: Iterable of strings or UTF-8 encoded bytes, like
+            requests Response.iter_content().
+        """
+        self._chunks = iter(chunks)
+        self._bytes = codecs.getincrementaldecoder('utf-8')()
+
+        # @property buffer: Text read from stream and not released yet.
+        self.buffer = ''
+
+        # @property pos: Position of the next character in @property buffer.
+        self.pos = 0
+
+    def _read(self, size=1):
+        """ Append at least @param size characters to buffer, dropping what
+            was already read.
+            @return: False if stream ended with nothing read.
+        """
+        parts = [self.buffer[self.pos:]]
+        read = 0
+        for chunk in self._chunks:
+            if not isinstance(chunk, PYSTR):
+                chunk = self._bytes.decode(chunk)
+            parts.append(chunk)
+            read += len(chunk)
+            if read >= size:
+                break
+        self.buffer = ''.join(parts)
+        self.pos = 0
+        return read > 0
+
+    def _skip_whitespace(self):
+        while True:
+            self.pos = self.whitespace.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._read():
+                return
+
+    def peek(self):
+        """ @return: Next character that isn't whitespace, or '' at the end
+            of stream.
+        """
+        self._skip_whitespace()
+        return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars):
+        """ Read next character that isn't whitespace.
+            @param chars: Characters accepted.
+            @return: Character read.
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('Expecting one of %r, found %r' % (chars,
+                char or 'end of stream'))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """ @return: Next JSON value.
+        """
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                # Incomplete value. Grow buffer geometrically, so long values
+                # aren't decoded over and over.
+                if self._read(max(len(self.buffer) - self.pos, 1)):
+                    continue
+                raise
+            if isinstance(value, numbers.Number) and not isinstance(value,
+                    bool) and self.buffer[end:end + 1] not in self.delimiters:
+                # Numbers may go on in the next chunk, like '1' + '.5'.
+                if self._read():
+                    continue
+            self.pos = end
+            return value
+
+    def iter_array(self):
+        """ @return: Generator of elements of next JSON array.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
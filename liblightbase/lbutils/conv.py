@@ -7,6 +7,7 @@ from liblightbase.lbbase.lbstruct.group import Group
 from liblightbase.lbbase.lbstruct.group import GroupMetadata
 from liblightbase import pytypes
 from liblightbase.lbdoc.metadata import DocumentMetadata
+from liblightbase.lbdoc.metaclass import trusted_document
 
 
 def json2base(jsonobj):
@@ -24,13 +25,15 @@ def base2json(base):
     return base.json
 
 
-def json2document(base, jsonobj):
+def json2document(base, jsonobj, trusted=False):
     """
     Convert a JSON string to BaseMetaClass object.
     @param base: liblightbae.lbbase.Base object
     @param jsonobj: JSON string.
+    @param trusted: See dict2document().
     """
-    return dict2document(base=base, dictobj=lbutils.json2object(jsonobj))
+    return dict2document(base=base, dictobj=lbutils.json2object(jsonobj),
+        trusted=trusted)
 
 
 def document2json(base, document, **kw):
@@ -88,13 +91,18 @@ def dict2base(dictobj):
         content=assemble_content(dictobj['content']))
     return base
 
-def dict2document(base, dictobj, metaclass=None):
+def dict2document(base, dictobj, metaclass=None, trusted=False):
     """
     Convert a dictionary object to BaseMetaClass object.
     @param base: Base object.
     @param dictobj: dictionary object.
     @param metaclass: GroupMetaClass in question.
+    @param trusted: dictobj is known to be valid, like documents returned by
+    the server. Values are put on metaclass instances without being
+    validated. See lbdoc.metaclass.trusted_document().
     """
+    if trusted:
+        return trusted_document(base, dictobj, metaclass)
     kwargs = {}
     if metaclass is None:
         metaclass = base.metaclass()
@@ -298,3 +306,5 @@ class dict2genericbase(object):
     @property
     def json(self):
         return lbutils.object2json(self, default=lambda o: o.__dict__)
+
+lbutils.register_encoder(dict2genericbase, lambda obj: obj.__dict__)
@@ -1,6 +1,10 @@
 #!/usr/env python
 # -*- coding: utf-8 -*-
 import re
+import datetime
+import threading
+import collections
+from liblightbase.lbutils.const import PYSTR
 
 class reify(object):
     """ Use as a class method decorator.  It operates almost exactly like the
@@ -23,6 +27,163 @@ class reify(object):
         setattr(inst, self.wrapped.__name__, val)
         return val
 
+class LRUStore(object):
+    """ Thread safe dictionary holding at most @property maxsize items. When
+    full, setting a new key discards the least recently used one.
+    """
+
+    def __init__(self, maxsize=1000):
+
+        # @property maxsize: Maximum number of items kept.
+        self.maxsize = maxsize
+
+        # @property hits: Number of @method get() calls that found the key.
+        self.hits = 0
+
+        # @property misses: Number of @method get() calls that didn't.
+        self.misses = 0
+
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key):
+        with self._lock:
+            value = self._data.pop(key)
+            self._data[key] = value
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def info(self):
+        """ @return: Dictionary with cache statistics.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+    def pop(self, key, *default):
+        with self._lock:
+            return self._data.pop(key, *default)
+
+    def clear(self):
+        """ Remove all items and reset statistics.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+# @property DATE_CACHE_SIZE: Maximum number of values kept by each cache of
+# parse_date(), parse_time() and parse_datetime(). A full cache is emptied.
+DATE_CACHE_SIZE = 1024
+
+_date_cache = { }
+_time_cache = { }
+_datetime_cache = { }
+
+def _cached(cache, value, parsed):
+    if len(cache) >= DATE_CACHE_SIZE:
+        cache.clear()
+    cache[value] = parsed
+    return parsed
+
+def _digits(*values):
+    return all(value.isdigit() for value in values)
+
+def parse_date(value):
+    """ Same as datetime.strptime(value, '%d/%m/%Y').date(). Values at the
+    exact format 'dd/mm/yyyy' are parsed by slicing, other values are left to
+    strptime.
+    """
+    try:
+        return _date_cache[value]
+    except (KeyError, TypeError):
+        pass
+    if isinstance(value, PYSTR) and len(value) == 10 and \
+            value[2] == '/' and value[5] == '/' and \
+            _digits(value[:2], value[3:5], value[6:]):
+        try:
+            return _cached(_date_cache, value, datetime.date(int(value[6:]),
+                int(value[3:5]), int(value[:2])))
+        except ValueError:
+            # Out of range values are left to strptime, for its message.
+            pass
+    parsed = datetime.datetime.strptime(value, '%d/%m/%Y').date()
+    return _cached(_date_cache, value, parsed)
+
+def parse_time(value):
+    """ Same as datetime.strptime(value, '%H:%M:%S').time(), parsing values at
+    the exact format 'HH:MM:SS' by slicing.
+    """
+    try:
+        return _time_cache[value]
+    except (KeyError, TypeError):
+        pass
+    if isinstance(value, PYSTR) and len(value) == 8 and \
+            value[2] == ':' and value[5] == ':' and \
+            _digits(value[:2], value[3:5], value[6:]):
+        try:
+            return _cached(_time_cache, value, datetime.time(int(value[:2]),
+                int(value[3:5]), int(value[6:])))
+        except ValueError:
+            pass
+    parsed = datetime.datetime.strptime(value, '%H:%M:%S').time()
+    return _cached(_time_cache, value, parsed)
+
+def parse_datetime(value):
+    """ Same as datetime.strptime(value, '%d/%m/%Y %H:%M:%S'), parsing values
+    at the exact format 'dd/mm/yyyy HH:MM:SS' by slicing.
+    """
+    try:
+        return _datetime_cache[value]
+    except (KeyError, TypeError):
+        pass
+    if isinstance(value, PYSTR) and len(value) == 19 and \
+            value[2] == '/' and value[5] == '/' and value[10] == ' ' and \
+            value[13] == ':' and value[16] == ':' and \
+            _digits(value[:2], value[3:5], value[6:10], value[11:13],
+                value[14:16], value[17:]):
+        try:
+            return _cached(_datetime_cache, value, datetime.datetime(
+                int(value[6:10]), int(value[3:5]), int(value[:2]),
+                int(value[11:13]), int(value[14:16]), int(value[17:])))
+        except ValueError:
+            pass
+    parsed = datetime.datetime.strptime(value, '%d/%m/%Y %H:%M:%S')
+    return _cached(_datetime_cache, value, parsed)
+
 def validate_url(url):
     #http://stackoverflow.com/questions/7160737/python-how-to-validate-a-url-in-python-malformed-or-not
     _url = None
@@ -0,0 +1,537 @@
+#!/usr/env python
+# -*- coding: utf-8 -*-
+import copy
+import random
+import unittest
+
+from liblightbase.lbbase.lbstruct.field import Field
+from liblightbase.lbdoc import doctree
+from liblightbase.lbdoc.doctree import DocumentTree
+from liblightbase.lbsearch.path import PathOperation
+from liblightbase.tests.helpers import pessoa_base
+from liblightbase.tests.helpers import pessoa_document
+
+
+class JsonPathCacheTest(unittest.TestCase):
+    """
+    Test compiled jsonpath expressions cache
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+        doctree.JPATH_CACHE.clear()
+
+    def test_cache_hits(self):
+        tree = DocumentTree(pessoa_document(), self.base)
+        path = ['dependente', '1', 'nome_dep']
+        jpath = tree.lbpath2jpath(path)
+        self.assertEqual(doctree.jpath_cache_info()['misses'], 1)
+        self.assertIs(tree.lbpath2jpath(list(path)), jpath)
+        info = doctree.jpath_cache_info()
+        self.assertEqual(info['hits'], 1)
+        self.assertEqual(info['misses'], 1)
+        self.assertEqual(info['size'], 1)
+
+    def test_shared_by_trees(self):
+        path = ['nome']
+        jpath = DocumentTree(pessoa_document(), self.base).lbpath2jpath(path)
+        self.assertIs(DocumentTree({ }, self.base).lbpath2jpath(path), jpath)
+
+    def test_cache_is_bounded(self):
+        maxsize = doctree.JPATH_CACHE.maxsize
+        doctree.JPATH_CACHE.maxsize = 2
+        try:
+            tree = DocumentTree(pessoa_document(), self.base)
+            for index in range(5):
+                tree.lbpath2jpath(['dependente', str(index)])
+            self.assertEqual(doctree.jpath_cache_info()['size'], 2)
+        finally:
+            doctree.JPATH_CACHE.maxsize = maxsize
+
+class NativeResolverTest(unittest.TestCase):
+    """
+    Test native resolver gives the same matches as jsonpath_rw
+    """
+
+    paths = [
+        ['nome'],
+        ['tags'],
+        ['tags', '1'],
+        ['tags', '*'],
+        ['tags', '5'],
+        ['dependente'],
+        ['dependente', '0'],
+        ['dependente', '1', 'nome_dep'],
+        ['dependente', '*', 'idade_dep'],
+        ['dependente', '*', 'missing'],
+        ['dependente', '9', 'nome_dep'],
+        ['missing'],
+        ['missing', '0'],
+        ['nome', '*'],
+        ['_metadata', 'id_doc'],
+        ['_metadata', '*'],
+    ]
+
+    def setUp(self):
+        self.base = pessoa_base()
+
+    def matches(self, path, native, create_path):
+        tree = DocumentTree(pessoa_document(), self.base, create_path)
+        if native:
+            matches = tree.find(path)
+        else:
+            matches = tree.lbpath2jpath(path).find(tree.root)
+        return ([(match.value, str(match.full_path),
+            tree.match2lbpath(match)) for match in matches],
+            tree.root.todict())
+
+    def test_parity(self):
+        for create_path in (False, True):
+            for path in self.paths:
+                native = self.matches(path, True, create_path)
+                jsonpath = self.matches(path, False, create_path)
+                self.assertEqual(native[0], [(value, full_path,
+                    [DocumentTree.toint(None, node) for node in lbpath])
+                    for value, full_path, lbpath in jsonpath[0]], path)
+                self.assertEqual(native[1], jsonpath[1], path)
+
+    def test_concrete_paths(self):
+        tree = DocumentTree(pessoa_document(), self.base)
+        matches = tree.find(['dependente', '*', 'nome_dep'])
+        self.assertEqual([match.lbpath for match in matches], [
+            ('dependente', 0, 'nome_dep'), ('dependente', 1, 'nome_dep')])
+        self.assertEqual(matches[0].full_path, 'dependente.[0].nome_dep')
+
+    def test_fallback(self):
+        doctree.JPATH_CACHE.clear()
+        tree = DocumentTree(pessoa_document(), self.base)
+        tree.find(['dependente', '0', 'nome_dep'])
+        self.assertEqual(doctree.jpath_cache_info()['misses'], 0)
+        self.assertEqual(doctree.compile_lbpath(['$']), None)
+        self.assertEqual(tree.put_path(['', ''], lambda match:
+            (True, {'nome': 'Raiz'})), {'nome': 'Raiz'})
+
+    def test_get_path_many(self):
+        self.assertEqual(self.base.get_path(pessoa_document(),
+            ['dependente', '*', 'idade_dep']), {
+                'dependente.[0].idade_dep': 10,
+                'dependente.[1].idade_dep': 12})
+
+class StructIndexTest(unittest.TestCase):
+    """
+    Test structures looked up by normalized path
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+
+    def test_paths(self):
+        entry = self.base.get_path_struct(['dependente', '1', 'idade_dep'])
+        self.assertIs(entry.struct, self.base.get_struct('idade_dep'))
+        self.assertEqual(entry.path, ('dependente', '*', 'idade_dep'))
+        self.assertEqual(entry.dim, 1)
+        self.assertEqual(entry.datatype.__name__, 'Integer')
+        self.assertFalse(entry.element)
+
+        entry = self.base.get_path_struct(['tags', 0])
+        self.assertIs(entry.struct, self.base.get_struct('tags'))
+        self.assertEqual(entry.dim, 1)
+        self.assertTrue(entry.element)
+
+        entry = self.base.get_path_struct(['dependente'])
+        self.assertIsNone(entry.datatype)
+        self.assertFalse(entry.is_rel)
+        self.assertIsNone(self.base.get_path_struct(['nome_dep']))
+        self.assertIsNone(self.base.get_path_struct(['nome', '0']))
+
+    def test_rebuilt_on_content_change(self):
+        self.base.content.append(Field('apelido', 'apelido', 'apelido',
+            'Text', ['Textual'], False, False))
+        entry = self.base.get_path_struct(['apelido'])
+        self.assertEqual(entry.struct.name, 'apelido')
+        self.base.get_struct('dependente').content.append(Field(
+            'apelido_dep', 'apelido_dep', 'apelido_dep', 'Text', ['Textual'],
+            False, False))
+        entry = self.base.get_path_struct(['dependente', '0', 'apelido_dep'])
+        self.assertEqual(entry.struct.name, 'apelido_dep')
+
+    def test_leaf_struct(self):
+        tree = DocumentTree(pessoa_document(), self.base)
+        self.assertEqual(tree.leaf_struct(['dependente', '0', 'nome_dep']
+            ).name, 'nome_dep')
+        self.assertEqual(tree.leaf_struct(['tags', '-1']).name, 'tags')
+
+
+def value(value):
+    return lambda match: (True, value)
+
+
+class InplaceTreeTest(unittest.TestCase):
+    """
+    Test inplace mode gives the same documents as copy mode
+    """
+
+    operations = [
+        ('set_path', ['tags'], value('c')),
+        ('set_path', ['dependente'], value('{"nome_dep": "Neto"}')),
+        ('put_path', ['nome'], value('Outro')),
+        ('put_path', ['dependente', '0', 'idade_dep'], value('11')),
+        ('put_path', ['dependente', '*', 'idade_dep'], value('20')),
+        ('put_path', ['dependente'], value('[]')),
+        ('put_path', ['', ''], value({'nome': 'Raiz'})),
+        ('patch_path', ['dependente', '1'], value('{"idade_dep": 13}')),
+        ('merge_path', ['tags'], value('["c"]')),
+        ('manual_path', ['tags'], value('[{"$add": "c"}]')),
+        ('delete_path', ['dependente', '0'], lambda match: True),
+        ('delete_path', ['tags', '*'], lambda match: True),
+    ]
+
+    def setUp(self):
+        self.base = pessoa_base()
+
+    def test_parity(self):
+        for method, path, fn in self.operations:
+            partial = pessoa_document()
+            del partial['dependente'][1]['idade_dep']
+            for document in (pessoa_document(), partial,
+                    {'_metadata': {'id_doc': 1}}):
+                method_fn = getattr(self.base, method)
+                try:
+                    expected = method_fn(copy.deepcopy(document), path, fn)
+                except IndexError:
+                    self.assertRaises(IndexError, method_fn, document, path,
+                        fn, inplace=True)
+                    continue
+                result = method_fn(document, path, fn, inplace=True)
+                self.assertIs(result, document)
+                self.assertEqual(result, expected, (method, path))
+
+    def test_no_wrapping(self):
+        document = pessoa_document()
+        dependente = document['dependente']
+        self.base.put_path(document, ['dependente', '0', 'idade_dep'],
+            value('11'), inplace=True)
+        self.assertIs(document['dependente'], dependente)
+        self.assertIs(type(dependente), list)
+        self.assertIs(type(dependente[0]), dict)
+        self.assertEqual(dependente[0]['idade_dep'], 11)
+
+    def test_create_path(self):
+        document = {'_metadata': {'id_doc': 1}}
+        self.base.set_path(document, ['tags'], value('a'), inplace=True)
+        self.assertEqual(document['tags'], ['a'])
+        tree = DocumentTree(document, self.base, inplace=True)
+        self.assertEqual(tree.find(['dependente']), [])
+        self.assertNotIn('dependente', document)
+
+class MergeTest(unittest.TestCase):
+    """
+    Test merging lists by fingerprint
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+
+    def merge(self, doc_list, new_list, merge_key=None):
+        tree = DocumentTree({ }, self.base)
+        tree.merge_list(doc_list, new_list, merge_key)
+        return doc_list
+
+    def test_same_as_linear_merge(self):
+        doc_list = [1, 'a', {'x': [1, 2]}, [3, {'y': None}], None, True]
+        new_list = [1.0, 'b', {'x': [1, 2]}, {'x': [2, 1]}, [3, {'y': None}],
+            'b', None, False, 0, {'z': {'a': 1, 'b': 2}}, {'z': {'b': 2,
+            'a': 1}}]
+        expected = list(doc_list)
+        for item in new_list:
+            if item not in expected:
+                expected.append(item)
+        self.assertEqual(self.merge(list(doc_list), new_list), expected)
+
+    def test_unhashable(self):
+        self.assertEqual(self.merge([{'a': set([1])}], [{'a': set([1])},
+            {'a': set([2])}]), [{'a': set([1])}, {'a': set([2])}])
+
+    def test_merge_key(self):
+        document = pessoa_document()
+        result = self.base.merge_path(document, ['dependente'],
+            value('[{"nome_dep": "Filho", "idade_dep": 11}, '
+            '{"nome_dep": "Neto", "idade_dep": 1}, {"idade_dep": 12}]'),
+            merge_key='nome_dep')
+        self.assertEqual(result['dependente'], [
+            {'nome_dep': 'Filho', 'idade_dep': 10},
+            {'nome_dep': 'Filha', 'idade_dep': 12},
+            {'nome_dep': 'Neto', 'idade_dep': 1},
+            {'idade_dep': 12},
+        ])
+        self.assertRaises(KeyError, self.base.merge_path, document,
+            ['dependente'], value('[]'), merge_key='missing')
+
+class ManualListTest(unittest.TestCase):
+    """
+    Test list descriptors of manual_path
+    """
+
+    def setUp(self):
+        self.tree = DocumentTree({ }, pessoa_base())
+
+    def manual(self, doc_list, descriptors):
+        self.tree.manual_list(doc_list, descriptors)
+        return doc_list
+
+    def sequential(self, doc_list, descriptors):
+        """ Applies descriptors one at a time, with list.insert and del.
+        """
+        for descriptor in descriptors:
+            for key, value in descriptor.items():
+                args = key.split('#')
+                if args[0] == '$set':
+                    self.tree.manual_leaf_rec(doc_list, int(args[1]), value)
+                elif args[0] == '$add' and len(args) > 1:
+                    doc_list.insert(int(args[1]), value)
+                elif args[0] == '$add':
+                    doc_list.append(value)
+                elif len(args) > 1:
+                    del doc_list[int(args[1])]
+                else:
+                    doc_list.pop()
+        return doc_list
+
+    def test_in_order(self):
+        for descriptors, result in (
+                ([{'$remove': None}, {'$remove': None}], [1]),
+                ([{'$remove#0': None}, {'$remove#0': None}], [3]),
+                ([{'$add': 9}, {'$remove': None}], [1, 2, 3]),
+                ([{'$add#0': 9}, {'$set#0': 8}], [8, 1, 2, 3]),
+                ([{'$set#0': 8}, {'$remove#0': None}], [2, 3]),
+                ([{'$add#3': 9}, {'$remove#3': None}, {'$add#1': 7}],
+                    [1, 7, 2, 3])):
+            self.assertEqual(self.manual([1, 2, 3], descriptors), result)
+            self.assertEqual(self.sequential([1, 2, 3], descriptors), result)
+
+    def test_same_as_sequential(self):
+        rand = random.Random(13)
+        for _ in range(200):
+            size = 4
+            descriptors = [ ]
+            for _ in range(rand.randint(1, 12)):
+                command = rand.choice(['$set', '$add', '$add#', '$remove',
+                    '$remove#'])
+                if command == '$add':
+                    descriptors.append({command: rand.random()})
+                    size += 1
+                elif command == '$add#':
+                    descriptors.append({command + str(rand.randint(0, size)):
+                        rand.random()})
+                    size += 1
+                elif size == 0:
+                    continue
+                elif command == '$set':
+                    descriptors.append({'$set#%d' % rand.randrange(size):
+                        rand.random()})
+                elif command == '$remove':
+                    descriptors.append({command: None})
+                    size -= 1
+                else:
+                    descriptors.append({command + str(rand.randrange(size)):
+                        None})
+                    size -= 1
+            self.assertEqual(self.manual(list('abcd'), descriptors),
+                self.sequential(list('abcd'), descriptors), descriptors)
+
+    def test_set_added_dict(self):
+        self.assertEqual(self.manual([{'a': 1}], [
+            {'$add#0': {'b': 1}},
+            {'$set#0': {'c': 2}},
+            {'$set#1': {'a': 3}}]), [{'b': 1, 'c': 2}, {'a': 3}])
+
+    def test_same_position(self):
+        self.assertEqual(self.manual([1, 2], [{'$add#1': 'a'},
+            {'$add#1': 'b'}]), [1, 'b', 'a', 2])
+
+    def test_multi(self):
+        self.assertEqual(self.manual([{'a': 1}, 2, 3], [
+            {'$multi#0#3': [{'b': 2}, 'x', 'z', 'y']}]),
+            [{'a': 1, 'b': 2}, 'x', 'z', 'y'])
+
+    def test_nested(self):
+        doc_list = [[1, 2, 3], {'a': [1, 2]}]
+        self.manual(doc_list, [
+            {'$set#0': [{'$remove#0': None}, {'$add': 4}]},
+            {'$set#1': {'a': [{'$set#1': 5}]}},
+        ])
+        self.assertEqual(doc_list, [[2, 3, 4], {'a': [1, 5]}])
+
+    def test_errors_before_changes(self):
+        for descriptors in (
+                [{'$set#0': 'x'}, {'$unknown': 1}],
+                [{'$set#0': 'x'}, {'$remove#9': None}],
+                [{'$set#0': 'x'}, {'$add#4': 'y'}],
+                [{'$set#0': 'x'}, {'$set#a': 'y'}],
+                [{'$add': 4}, {'$set#4': 'x'}],
+                [{'$remove#1': None}, {'$remove#1': None},
+                    {'$remove#1': None}],
+                [{'$remove': None}, {'$add#3': 'x'}],
+                [{'$multi#0#1': ['x']}],
+                [{'$set#0': [{'$remove#5': None}]}],
+                [{'$set#1': [{'$add': 1}]}]):
+            doc_list = [[1], 2, 3]
+            self.assertRaises((KeyError, ValueError, IndexError),
+                self.manual, doc_list, descriptors)
+            self.assertEqual(doc_list, [[1], 2, 3], descriptors)
+
+    def test_manual_path(self):
+        result = pessoa_base().manual_path(pessoa_document(), ['tags'],
+            value('[{"$remove#0": null}, {"$add#1": "c"}]'))
+        self.assertEqual(result['tags'], ['b', 'c'])
+
+class PlannedManualListTest(ManualListTest):
+    """
+    Test list descriptors applied through ManualListPlan
+    """
+
+    def setUp(self):
+        super(PlannedManualListTest, self).setUp()
+        for name in ('MANUAL_PLAN_MIN', 'MANUAL_PLAN_DESCRIPTORS'):
+            self.addCleanup(setattr, doctree, name, getattr(doctree, name))
+            setattr(doctree, name, -1)
+
+class PruneTest(unittest.TestCase):
+    """
+    Test structural sharing prune
+    """
+
+    selections = [
+        ['nome'],
+        ['nome_dep'],
+        ['idade_dep', 'tags'],
+        ['dependente', 'nome_dep'],
+        ['nome_dep', 'dependente'],
+        ['_metadata', 'nome'],
+        ['missing'],
+        [ ],
+    ]
+
+    def setUp(self):
+        self.base = pessoa_base()
+
+    def test_same_as_prune(self):
+        document = pessoa_document()
+        document['dependente'].append({'idade_dep': 1})
+        tree = DocumentTree(document, self.base)
+        for nodes in self.selections:
+            self.assertEqual(tree.prune(document, nodes, share=True),
+                tree.prune(document, nodes), nodes)
+
+    def test_shared(self):
+        document = pessoa_document()
+        pruned = DocumentTree(document, self.base).prune(document,
+            ['tags', 'dependente'], share=True)
+        self.assertIs(pruned['tags'], document['tags'])
+        self.assertIs(pruned['dependente'], document['dependente'])
+
+    def test_struct_path(self):
+        self.assertEqual(self.base.get_struct_path('nome_dep'),
+            ['dependente', '*', 'nome_dep'])
+        for sname in self.base.__allsnames__:
+            path = self.base.get_struct(sname).path
+            del self.base.get_struct(sname).path
+            self.assertEqual(self.base.get_struct_path(sname), path)
+
+class ProjectionTest(unittest.TestCase):
+    """
+    Test projections compiled from select lists
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+
+    def test_same_as_prune(self):
+        documents = [pessoa_document(), {'nome': 'a'}, {'dependente': [ ]},
+            {'dependente': [{'nome_dep': 'b'}, { }]}]
+        tree = DocumentTree({ }, self.base)
+        for nodes in PruneTest.selections:
+            projection = self.base.compile_projection(nodes)
+            self.assertEqual(list(projection.project_many(documents)),
+                [tree.prune(document, nodes) for document in documents])
+
+    def test_select_all(self):
+        document = pessoa_document()
+        self.assertIs(self.base.compile_projection(['*'])(document), document)
+
+class ApplyOperationsTest(unittest.TestCase):
+    """
+    Test many path operations applied on a single tree
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+
+    def test_operations(self):
+        document = pessoa_document()
+        result = self.base.apply_operations(document, [
+            PathOperation('tags', 'insert', args=['c']),
+            PathOperation('dependente/1/idade_dep', 'update', args=['13']),
+            PathOperation('tags/0', 'delete'),
+            PathOperation('tags/1', 'delete'),
+            PathOperation('nome', 'update', args=['Outro']),
+        ])
+        self.assertEqual(result['tags'], ['c'])
+        self.assertEqual(result['nome'], 'Outro')
+        self.assertEqual(result['dependente'][1]['idade_dep'], 13)
+        self.assertEqual(document, pessoa_document())
+
+    def test_same_as_single_operations(self):
+        document = pessoa_document()
+        expected = self.base.set_path(document, ['dependente'],
+            value('{"nome_dep": "Neto"}'))
+        expected = self.base.put_path(expected, ['dependente', '*',
+            'idade_dep'], value('1'))
+        expected = self.base.delete_path(expected, ['dependente', '0',
+            'nome_dep'], lambda match: True)
+        result = self.base.apply_operations(pessoa_document(), [
+            PathOperation('dependente', 'insert',
+                args=['{"nome_dep": "Neto"}']),
+            PathOperation('dependente/*/idade_dep', 'update', args=['1']),
+            PathOperation('dependente/0/nome_dep', 'delete'),
+        ], inplace=True)
+        self.assertEqual(result, expected)
+
+    def test_delete_then_insert(self):
+        for delete, insert, value in (('tags/*', 'tags', 'x'),
+                ('dependente/*', 'dependente', '{"nome_dep": "Neto"}')):
+            path = delete.split('/')
+            expected = self.base.delete_path(pessoa_document(), path,
+                lambda match: True)
+            expected = self.base.set_path(expected, [insert],
+                lambda match: (True, value))
+            result = self.base.apply_operations(pessoa_document(), [
+                PathOperation(delete, 'delete'),
+                PathOperation(insert, 'insert', args=[value]),
+            ])
+            self.assertEqual(result, expected)
+            self.assertEqual(len(result[insert]), 1)
+
+    def test_nested_deletes(self):
+        result = self.base.apply_operations(pessoa_document(), [
+            PathOperation('dependente/*/nome_dep', 'delete'),
+            PathOperation('dependente/0', 'delete'),
+            PathOperation('dependente/0', 'delete'),
+        ])
+        self.assertEqual(result['dependente'], [{'idade_dep': 12}])
+
+    def test_functions(self):
+        def older(match, args):
+            return match.value['idade_dep'] > int(args[0])
+
+        result = self.base.apply_operations(pessoa_document(), [
+            PathOperation('dependente/*', 'delete', 'older', ['11']),
+        ], {'older': older})
+        self.assertEqual(len(result['dependente']), 1)
+        self.assertRaises(KeyError, self.base.apply_operations,
+            pessoa_document(), [PathOperation('nome', 'update', 'missing')])
+        self.assertRaises(IndexError, self.base.apply_operations,
+            pessoa_document(), [PathOperation('tags/5', 'delete')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Base models shared by test modules and benchmark scripts.
+"""
+from liblightbase.lbutils.conv import dict2base
+
+
+def field(name, datatype, multivalued=False, required=False,
+        indices=['Textual']):
+    """ @return: Field model in dictionary format. Name is also used as
+    alias and description.
+    """
+    return {'field': {
+        'name': name,
+        'alias': name,
+        'description': name,
+        'datatype': datatype,
+        'indices': indices,
+        'multivalued': multivalued,
+        'required': required}}
+
+
+def group(name, content, multivalued=True):
+    """ @return: Group model in dictionary format. Name is also used as
+    alias and description.
+    """
+    return {'group': {
+        'metadata': {
+            'name': name,
+            'alias': name,
+            'description': name,
+            'multivalued': multivalued},
+        'content': content}}
+
+
+def pessoa_base():
+    """ @return: Base with a required field, a relational field, a
+    multivalued field, a multivalued group and a single group. The groups
+    hold a relational field each.
+    """
+    return dict2base({
+        'metadata': {'name': 'pessoa'},
+        'content': [
+            field('nome', 'Text', required=True),
+            field('cpf', 'Text', indices=['Textual', 'Unico']),
+            field('tags', 'Text', multivalued=True),
+            group('dependente', [
+                field('nome_dep', 'Text'),
+                field('idade_dep', 'Integer',
+                    indices=['Textual', 'Ordenado']),
+            ]),
+            group('endereco', [
+                field('rua', 'Text'),
+                field('numero', 'Integer', indices=['Textual', 'Ordenado']),
+            ], multivalued=False),
+        ]})
+
+
+def pessoa_document():
+    """ @return: Valid document of pessoa_base(), in dictionary format.
+    """
+    return {
+        'nome': 'Pessoa',
+        'tags': ['a', 'b'],
+        'dependente': [
+            {'nome_dep': 'Filho', 'idade_dep': 10},
+            {'nome_dep': 'Filha', 'idade_dep': 12},
+        ],
+        '_metadata': {'id_doc': 1, 'dt_idx': None},
+    }
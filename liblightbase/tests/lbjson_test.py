@@ -3,12 +3,18 @@
 __author__ = 'eduardo'
 import unittest
 import json
+import datetime
 
 from liblightbase.lbbase.struct import Base, BaseMetadata
 from liblightbase.lbbase.lbstruct.group import *
 from liblightbase.lbbase.lbstruct.field import *
 from liblightbase.lbbase.content import Content
+from liblightbase import lbutils
 from liblightbase.lbutils.conv import json2base
+from liblightbase.lbutils.conv import dict2genericbase
+from liblightbase.lbsearch.path import PathOperation
+from liblightbase.lbtypes.standard import Text
+from liblightbase.lbtypes.extended import FileMask
 
 
 class TestJSON(unittest.TestCase):
@@ -198,3 +204,106 @@ class TestJSON(unittest.TestCase):
         :return:
         """
         pass
+
+
+class TestEncoders(unittest.TestCase):
+    """
+    Test encoders of non JSON types
+    """
+
+    def test_builtin_encoders(self):
+        now = datetime.datetime(2014, 8, 2, 10, 21, 49)
+        uuid = '0ea5c5b0-9b9a-4d6b-a0b8-1f7f2b6a4e3c'
+        value = {
+            'datetime': now,
+            'date': now.date(),
+            'time': now.time(),
+            'generic': dict2genericbase({'a': 1}),
+            'operation': PathOperation('a/b', 'update', args=[1]),
+            'datatype': Text(None, Field('nome', 'nome', 'nome', 'Text',
+                ['Textual'], False, False), None),
+            'filemask': FileMask(uuid, 'a.txt', 'text/plain', 1, uuid),
+        }
+        self.assertEqual(json.loads(lbutils.object2json(value)), {
+            'datetime': '02/08/2014 10:21:49',
+            'date': '02/08/2014',
+            'time': '10:21:49',
+            'generic': {'a': 1},
+            'operation': {'path': 'a/b', 'mode': 'update', 'fn': None,
+                'args': [1]},
+            'datatype': 'Text',
+            'filemask': {'id_file': uuid, 'filename': 'a.txt',
+                'mimetype': 'text/plain', 'filesize': 1, 'uuid': uuid},
+        })
+        self.assertRaises(TypeError, lbutils.object2json, object())
+
+    def test_register_encoder(self):
+        class Point(object):
+            def __init__(self, x, y):
+                self.x, self.y = x, y
+
+        class Point3D(Point):
+            pass
+
+        self.assertIsNone(lbutils.get_encoder(Point3D))
+        lbutils.register_encoder(Point, lambda obj: [obj.x, obj.y])
+        self.addCleanup(lbutils.JSON_ENCODERS.pop, Point)
+        self.assertEqual(json.loads(lbutils.object2json([Point(1, 2),
+            Point3D(3, 4)])), [[1, 2], [3, 4]])
+        self.assertIs(lbutils.get_encoder(Point3D),
+            lbutils.get_encoder(Point))
+
+class TestBackends(unittest.TestCase):
+    """
+    Test JSON backends give the same results
+    """
+
+    def setUp(self):
+        self.addCleanup(lbutils.set_json_backend,
+            lbutils.get_json_backend())
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, lbutils.set_json_backend, 'unknown')
+
+    def test_backend_parity(self):
+        try:
+            lbutils.set_json_backend('orjson')
+        except ImportError:
+            self.skipTest('orjson not installed')
+        values = [
+            {'a': [1, 2.5, u'ção', None, True], 1: 'b', None: 'c'},
+            {'_metadata': {'dt_doc': datetime.datetime(2014, 8, 2, 10, 21,
+                49), 'date': datetime.date(2014, 8, 2)}},
+            [2 ** 70, {'operation': PathOperation('a', 'update', args=[])}],
+            (1, [dict2genericbase({'a': 1})]),
+        ]
+        encoded = [lbutils.object2json(value) for value in values]
+        self.assertRaises(TypeError, lbutils.object2json, object())
+        self.assertEqual(lbutils.json2object('[1, 2] trailing'), [1, 2])
+
+        lbutils.set_json_backend('json')
+        for value, text in zip(values, encoded):
+            self.assertEqual(json.loads(text),
+                json.loads(lbutils.object2json(value)))
+            self.assertEqual(lbutils.json2object(text), json.loads(text))
+        self.assertEqual(lbutils.json2object('[1, 2] trailing'), [1, 2])
+
+    def test_text(self):
+        value = {'a': 1, 'b': [1e-7]}
+        text = lbutils.object2json(value, separators=(', ', ': '))
+        self.assertEqual(text, json.dumps(value))
+        try:
+            lbutils.set_json_backend('orjson')
+        except ImportError:
+            self.skipTest('orjson not installed')
+        self.assertEqual(lbutils.object2json(value), '{"a":1,"b":[1e-7]}')
+        self.assertEqual(lbutils.object2json(value, separators=(', ', ': ')),
+            text)
+
+    def test_auto(self):
+        self.assertIn(lbutils.set_json_backend('auto'),
+            lbutils.JSON_BACKENDS)
+        self.assertEqual(lbutils.json2object(lbutils.object2json(
+            {'a': [1]})), {'a': [1]})
+        self.assertEqual(lbutils.object2json({'a': 1}, indent=1),
+            '{\n "a": 1\n}')
@@ -1,7 +1,12 @@
+import copy
 import unittest
 from datetime import datetime
 from .. import lbmetaclass
 from .. import pytypes
+from ..lbutils.conv import dict2document
+from ..lbutils.conv import document2dict
+from .helpers import pessoa_base
+from .helpers import pessoa_document
 
 class lbmetaclass_test(unittest.TestCase):
 
@@ -63,4 +68,41 @@ class lbmetaclass_test(unittest.TestCase):
         self.assertEquals(obj['dic'],{ 1:1 })
 
     def tearDown(self):
-        pass
\ No newline at end of file
+        pass
+
+class TrustedDocumentTest(unittest.TestCase):
+    """
+    Test documents built from trusted dictionaries
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+        self.document = pessoa_document()
+        self.document['_metadata'] = {'id_doc': 1,
+            'dt_doc': '02/08/2014 10:21:49',
+            'dt_last_up': '02/08/2014 10:21:49'}
+
+    def test_same_document(self):
+        trusted = dict2document(self.base, self.document, trusted=True)
+        self.assertIn('_metadata', self.document)
+        checked = dict2document(self.base, copy.deepcopy(self.document))
+        self.assertEqual(document2dict(self.base, trusted),
+            document2dict(self.base, checked))
+        self.assertEqual(trusted.dependente[1].nome_dep, 'Filha')
+        self.assertEqual(trusted.tags, ['a', 'b'])
+        self.assertEqual(trusted._metadata.id_doc, 1)
+        self.assertIs(type(trusted), type(checked))
+        self.assertIs(type(trusted.dependente), type(checked.dependente))
+
+    def test_not_validated(self):
+        self.document['dependente'][0]['idade_dep'] = 'dez'
+        self.assertRaises(Exception, dict2document, self.base,
+            copy.deepcopy(self.document))
+        trusted = dict2document(self.base, self.document, trusted=True)
+        self.assertEqual(trusted.dependente[0].idade_dep, 'dez')
+
+        # Assignments are still validated.
+        self.assertRaises(Exception, setattr, trusted.dependente[0],
+            'idade_dep', 'onze')
+        trusted.dependente[0].idade_dep = 11
+        self.assertEqual(trusted.dependente[0].idade_dep, 11)
@@ -2,9 +2,15 @@
 # -*- coding: utf-8 -*-
 __author__ = 'carlos'
 
+import json
 import unittest
 from liblightbase.lbsearch.search import OrderBy
+from liblightbase.lbsearch.search import Results
+from liblightbase.lbsearch.search import Collection
+from liblightbase.lbsearch.search import NullDocument
+from liblightbase.lbsearch.search import CollectionReader
 from liblightbase.lbsearch.search import Search
+from liblightbase.tests.helpers import pessoa_base
 
 
 class ClassSearchTest(unittest.TestCase):
@@ -37,4 +43,136 @@ class ClassSearchTest(unittest.TestCase):
 
         self.obj_Search = Search(select, obj_orderby,
                                  literal, limit, offset)
-        self.obj_Search._asjson()
\ No newline at end of file
+        self.obj_Search._asjson()
+
+
+def pessoa_results(count=20):
+    return [{'nome': u'João %d' % i, '_metadata': {
+        'id_doc': i,
+        'dt_doc': '02/08/2014 10:21:49',
+        'dt_last_up': '02/08/2014 10:21:49'}} for i in range(count)]
+
+
+class CollectionReaderTest(unittest.TestCase):
+    """Test collections read from JSON streams
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+        self.results = pessoa_results()
+
+    def chunks(self, collection, size=7):
+        data = json.dumps(collection).encode('utf-8')
+        return (data[i:i + size] for i in range(0, len(data), size))
+
+    def test_results(self):
+        chunks = self.chunks({'result_count': 20, 'limit': 100,
+            'offset': 0, 'results': self.results + [None]})
+        reader = CollectionReader(self.base, chunks)
+        self.assertEqual(reader.result_count, 20)
+        self.assertEqual(reader.limit, 100)
+        documents = list(reader)
+        self.assertEqual(len(documents), 21)
+        self.assertEqual(documents[3].nome, u'João 3')
+        self.assertEqual(documents[3]._metadata.id_doc, 3)
+        self.assertIsInstance(documents[20], NullDocument)
+        self.assertEqual(list(reader), [ ])
+
+    def test_formats(self):
+        collection = {'results': self.results, 'result_count': 20}
+        reader = CollectionReader(self.base, self.chunks(collection, 1),
+            'dict')
+        self.assertEqual(list(reader), self.results)
+        self.assertEqual(reader.result_count, 20)
+        reader = CollectionReader(self.base, [json.dumps(collection)],
+            'generic')
+        self.assertEqual([r.nome for r in reader], [r['nome'] for r in
+            self.results])
+        self.assertRaises(ValueError, CollectionReader, self.base, ['{}'],
+            'unknown')
+
+    def test_attributes_after_results(self):
+        reader = CollectionReader(self.base, self.chunks({
+            'results': self.results, 'result_count': 20, 'offset': 5}),
+            'dict')
+        results = iter(reader)
+        self.assertEqual(next(results), self.results[0])
+        self.assertEqual(reader.offset, 5)
+        self.assertEqual(reader.result_count, 20)
+        self.assertEqual(list(results), [ ])
+
+    def test_malformed(self):
+        reader = CollectionReader(self.base, ['{"results": [{"nome": 1}',
+            ', {"nome"'], 'dict')
+        results = iter(reader)
+        self.assertEqual(next(results), {'nome': 1})
+        self.assertRaises(ValueError, next, results)
+        self.assertRaises(ValueError, CollectionReader, self.base, ['[]'])
+        self.assertIsNone(CollectionReader(self.base, ['{}']).limit)
+
+    def test_close(self):
+        closed = [ ]
+        close = lambda: closed.append(True)
+        collection = {'results': self.results, 'result_count': 20}
+
+        reader = CollectionReader(self.base, self.chunks(collection), 'dict',
+            close)
+        self.assertEqual(len(list(reader)), 20)
+        self.assertEqual(reader.result_count, 20)
+        reader.close()
+        self.assertEqual(closed, [True])
+
+        with CollectionReader(self.base, self.chunks(collection), 'dict',
+                close) as reader:
+            results = iter(reader)
+            self.assertEqual(next(results), self.results[0])
+        self.assertEqual(len(closed), 2)
+        self.assertEqual(list(results), [ ])
+        self.assertEqual(list(reader), [ ])
+
+        CollectionReader(self.base, ['{}'], close=close)
+        self.assertEqual(len(closed), 3)
+        reader = CollectionReader(self.base, ['{"results": [1,'], 'dict',
+            close)
+        self.assertRaises(ValueError, list, reader)
+        self.assertEqual(len(closed), 4)
+        self.assertRaises(ValueError, CollectionReader, self.base, ['[]'],
+            close=close)
+        self.assertEqual(len(closed), 5)
+
+class ResultsTest(unittest.TestCase):
+    """Test results are converted on first access
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+        self.results = pessoa_results()
+
+    def test_lazy(self):
+        results = Results(self.base, self.results + [None])
+        self.assertTrue(all(isinstance(result, dict) or result is None
+            for result in list.__iter__(results)))
+        document = results[2]
+        self.assertEqual(document.nome, u'João 2')
+        self.assertIs(results[2], document)
+        self.assertIsInstance(results[-1], NullDocument)
+        self.assertIsInstance(list.__getitem__(results, 3), dict)
+        self.assertEqual([r.nome for r in results[:2]], [u'João 0',
+            u'João 1'])
+        self.assertEqual(len([r for r in results]), 21)
+        self.assertEqual(results.index(document), 2)
+        self.assertEqual(results.raw, self.results + [None])
+        self.assertIn('_metadata', results.raw[2])
+
+    def test_trusted(self):
+        results = Results(self.base, self.results, trusted=True)
+        self.assertEqual(results[1].nome, u'João 1')
+        self.assertEqual(results[1]._metadata.id_doc, 1)
+        self.assertIn('_metadata', results.raw[1])
+
+    def test_raw(self):
+        collection = Collection(self.base, self.results, 20, 100, 0,
+            raw=True)
+        self.assertIs(collection.results, self.results)
+        collection = Collection(self.base, self.results, 20, 100, 0)
+        self.assertEqual(collection.results[0]._metadata.id_doc, 0)
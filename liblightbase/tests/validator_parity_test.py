@@ -0,0 +1,227 @@
+#!/usr/env python
+# -*- coding: utf-8 -*-
+import copy
+import datetime
+import unittest
+
+from liblightbase.lbutils import conv
+from liblightbase.lbutils.conv import dict2base
+from liblightbase.lbutils.conv import json2base
+from liblightbase.lbdoc.metadata import DocumentMetadata
+from liblightbase.lbbase.struct import Base, BaseMetadata
+from liblightbase.lbbase.lbstruct.group import *
+from liblightbase.lbbase.lbstruct.field import *
+from liblightbase.lbbase.content import Content
+from liblightbase.tests import lbjson_test
+from liblightbase.tests import load_test_data
+from liblightbase.tests import metaclass
+from liblightbase.tests import teste_santos
+from liblightbase.tests.helpers import field
+from liblightbase.tests.helpers import group
+
+UUID = '0ea5c5b0-9b9a-4d6b-a0b8-1f7f2b6a4e3c'
+
+FILEMASK = {
+    'id_file': UUID,
+    'filename': 'file.txt',
+    'mimetype': 'text/plain',
+    'filesize': 10,
+    'uuid': UUID
+}
+
+# Valid and invalid sample values for each datatype.
+SAMPLES = {
+    'Boolean': (True, 'yes'),
+    'Date': ('02/08/2014', '2014-08-02'),
+    'DateTime': ('02/08/2014 10:21:49', '02/08/2014'),
+    'Decimal': (1.5, '1.5'),
+    'Document': (FILEMASK, dict(FILEMASK, id_file='not an uuid')),
+    'Email': ('info@lightbase.com.br', 1),
+    'File': (FILEMASK, 'not a file mask'),
+    'Html': ('<p>html</p>', 1),
+    'Image': (FILEMASK, dict(FILEMASK, uuid=1)),
+    'Integer': (1, 'one'),
+    'Json': ({'a': [1, 2, {'b': None}]}, object()),
+    'Money': (2.5, 2),
+    'SelfEnumerated': (1, 1),
+    'Sound': (FILEMASK, [FILEMASK]),
+    'Text': ('text', 1),
+    'TextArea': ('text area', 1.5),
+    'Time': ('10:21:49', '10h21'),
+    'Url': ('http://lightbase.com.br/', 1),
+    'Video': (FILEMASK, {'filename': 1}),
+}
+
+
+def all_types_base():
+    """ Base with every datatype, at top level and nested.
+    """
+    types = sorted(SAMPLES)
+    return dict2base({
+        'metadata': {'name': 'all_types'},
+        'content': [field('t_' + t.lower(), t, indices=['Textual', 'Unico'])
+            for t in types] + [
+            group('multi', [
+                field('m_' + t.lower(), t, multivalued=True,
+                    required=t == 'Text', indices=['Textual', 'Ordenado'])
+                for t in types] + [
+                group('single', [
+                    field('s_text', 'Text', required=True,
+                        indices=['Ordenado']),
+                    field('s_files', 'File', multivalued=True),
+                ], multivalued=False)
+            ])
+        ]})
+
+
+def fixture_bases():
+    """ Bases used by test modules, plus all_types_base().
+    """
+    bases = [ ]
+
+    case = metaclass.LBDocumentTestCase('test_create_document')
+    case.setUp()
+    bases.append(case.base)
+
+    bases.append(json2base(teste_santos.JSON))
+
+    case = lbjson_test.TestJSON('test_base_json')
+    case.setUp()
+    content_list = Content()
+    content_list.append(Field(**case.field))
+    content_list.append(Field(**case.field2))
+    group_content = content_list
+    content_list = Content()
+    content_list.append(Group(
+        metadata=GroupMetadata(**case.group_metadata),
+        content=group_content))
+    content_list.append(Field(**case.field3))
+    bases.append(Base(metadata=BaseMetadata(**case.base_metadata),
+        content=content_list))
+
+    school = load_test_data.School(name='Escola', city='Brasilia',
+        country='BR', teachers=[{'name': 'Professor', 'title': 'Doutor'}],
+        courses=['Computacao'], foundation_date=datetime.datetime.now(),
+        graduation={'grad_name': 'Fundamental', 'grad_alias': 'Grau 1'})
+    bases.append(conv.pyobject2base(school))
+
+    bases.append(all_types_base())
+    return bases
+
+
+def build_document(content, elements=2):
+    """ Valid document for content.
+    """
+    document = { }
+    for struct in content:
+        if struct.is_group:
+            value = build_document(struct.content, elements)
+            if struct.metadata.multivalued:
+                value = [copy.deepcopy(value) for _ in range(elements)]
+            document[struct.metadata.name] = value
+        elif struct.datatype != 'SelfEnumerated':
+            value = SAMPLES[struct.datatype][0]
+            if struct.multivalued:
+                value = [copy.deepcopy(value) for _ in range(elements)]
+            document[struct.name] = copy.deepcopy(value)
+    return document
+
+
+def locations(content, prefix=()):
+    """ Paths of all structures on documents built by build_document.
+    """
+    for struct in content:
+        if struct.is_group:
+            path = prefix + (struct.metadata.name,)
+            yield path, struct
+            if struct.metadata.multivalued:
+                path = path + (0,)
+            for location in locations(struct.content, path):
+                yield location
+        else:
+            yield prefix + (struct.name,), struct
+
+
+def mutations(base):
+    """ Valid and invalid documents derived from a valid one.
+    """
+    document = build_document(base.content)
+    yield document
+    yield build_document(base.content, elements=0)
+    yield dict(document, extra_key=1)
+    yield []
+
+    def mutate(path, fn):
+        mutated = copy.deepcopy(document)
+        parent = mutated
+        for key in path[:-1]:
+            parent = parent[key]
+        fn(parent, path[-1])
+        return mutated
+
+    def delete(parent, key):
+        parent.pop(key, None)
+
+    def setter(value):
+        def set_value(parent, key):
+            parent[key] = value
+        return set_value
+
+    for path, struct in locations(base.content):
+        yield mutate(path, delete)
+        yield mutate(path, setter(None))
+        yield mutate(path, setter(''))
+        yield mutate(path, setter({}))
+        yield mutate(path, setter([]))
+        yield mutate(path, setter([None]))
+        yield mutate(path, setter([1, 'a']))
+        if struct.is_group:
+            yield mutate(path + ('extra_key',) if not
+                struct.metadata.multivalued else path + (0, 'extra_key'),
+                setter(1))
+            yield mutate(path, setter('string'))
+        else:
+            invalid = SAMPLES[struct.datatype][1]
+            if struct.multivalued:
+                yield mutate(path, setter([invalid]))
+                yield mutate(path, setter([SAMPLES[struct.datatype][0],
+                    invalid]))
+            yield mutate(path, setter(invalid))
+
+
+class ValidatorParityTest(unittest.TestCase):
+    """
+    Test native and voluptuous validation engines give the same results
+    """
+
+    def setUp(self):
+        now = datetime.datetime.now()
+        self.meta = DocumentMetadata(1, now, now)
+
+    def validate(self, base, document, engine):
+        try:
+            document, reldata, files, _ = base.validate(
+                copy.deepcopy(document), self.meta, engine=engine)
+        except Exception as e:
+            return (type(e), str(e))
+        return (document, reldata, files)
+
+    def test_parity(self):
+        count = 0
+        for base in fixture_bases():
+            for document in mutations(base):
+                native = self.validate(base, document, 'native')
+                voluptuous = self.validate(base, document, 'voluptuous')
+                self.assertEqual(native, voluptuous, '%s: %r' % (
+                    base.metadata.name, document))
+                count += 1
+        self.assertTrue(count > 500)
+
+    def test_default_engine(self):
+        base = fixture_bases()[0]
+        self.assertEqual(base.validator.__class__.__name__,
+            'NativeValidator')
+        self.assertRaises(ValueError, base.get_validator, 'unknown')
+
+if __name__ == '__main__':
+    unittest.main()
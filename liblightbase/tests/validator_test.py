@@ -0,0 +1,600 @@
+#!/usr/env python
+# -*- coding: utf-8 -*-
+import sys
+import copy
+import unittest
+import datetime
+import threading
+
+from liblightbase import lbutils
+from liblightbase.lbutils.conv import dict2base
+from liblightbase.lbbase.lbstruct.field import Field
+from liblightbase.lbbase.validator import ValidationContext
+from liblightbase.lbdoc.metadata import DocumentMetadata
+from liblightbase.lbutils.exc import ValidationError
+from liblightbase.tests.helpers import field
+from liblightbase.tests.helpers import pessoa_base
+
+
+class CompiledSchemaTest(unittest.TestCase):
+    """
+    Test compiled validation schema
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+        now = datetime.datetime.now()
+        self.meta = DocumentMetadata(1, now, now)
+
+    def test_schema_is_cached(self):
+        validator = self.base.validator
+        self.base.validate({'nome': 'a'}, self.meta)
+        self.base.validate({'nome': 'b'}, self.meta)
+        self.assertIs(self.base.validator, validator)
+
+    def test_schema_invalidated_on_content_change(self):
+        validator = self.base.validator
+        self.base.content.append(Field('apelido', 'apelido', 'apelido',
+            'Text', ['Textual'], False, False))
+        self.assertIsNot(self.base.validator, validator)
+        document, _, _, _ = self.base.validate({'nome': 'a',
+            'apelido': 'b'}, self.meta)
+        self.assertEqual(document['apelido'], 'b')
+
+    def test_schema_invalidated_on_group_change(self):
+        document = {'nome': 'a', 'dependente': [{'apelido_dep': 'b'}]}
+        for engine in ('native', 'voluptuous'):
+            self.base.get_validator(engine)
+        self.base.get_struct('dependente').content.append(Field(
+            'apelido_dep', 'apelido_dep', 'apelido_dep', 'Text', ['Textual'],
+            False, False))
+        for engine in ('native', 'voluptuous'):
+            result, _, _, _ = self.base.validate(copy.deepcopy(document),
+                self.meta, engine=engine)
+            self.assertEqual(result['dependente'][0]['apelido_dep'], 'b')
+
+    def test_sinks_as_arguments(self):
+        reldata, files = { }, [ ]
+        document = self.base.validator({
+            'nome': 'a',
+            'cpf': '123',
+            'dependente': [{'idade_dep': 10}, {'idade_dep': 12}]
+        }, 7, reldata, files)
+        self.assertEqual(document['nome'], 'a')
+        self.assertEqual(reldata['cpf'], '123')
+        self.assertEqual(reldata['idade_dep'], [10, 12])
+        self.assertIsNone(self.base.validator.context.reldata)
+        self.assertNotIn(7, self.base.__reldata__)
+
+    def test_validate_result(self):
+        document, reldata, files, _ = self.base.validate({
+            'nome': 'a',
+            'cpf': '123',
+        }, self.meta)
+        self.assertEqual(reldata, {'cpf': '123'})
+        self.assertEqual(files, [])
+        self.assertEqual(document['_metadata']['id_doc'], 1)
+
+    def test_validate_many(self):
+        now = datetime.datetime.now()
+        documents = [
+            ({'nome': 'a', 'cpf': '1'}, DocumentMetadata(1, now, now)),
+            ({'cpf': '2'}, DocumentMetadata(2, now, now)),
+            ({'nome': 'c', 'dependente': [{'idade_dep': 3}]},
+                DocumentMetadata(3, now, now)),
+        ]
+        results = self.base.validate_many(iter(documents))
+        self.assertFalse(isinstance(results, list))
+        results = list(results)
+        self.assertEqual(len(results), 3)
+
+        document, reldata, files, errors = results[0]
+        self.assertEqual(errors, [])
+        self.assertEqual(document['_metadata']['id_doc'], 1)
+        self.assertEqual(reldata['cpf'], '1')
+
+        document, reldata, files, errors = results[1]
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], ValidationError)
+        self.assertEqual(document, {'cpf': '2'})
+
+        document, reldata, files, errors = results[2]
+        self.assertEqual(errors, [])
+        self.assertEqual(reldata, {'idade_dep': [3]})
+
+        for id in (1, 2, 3):
+            self.assertNotIn(id, self.base.__reldata__)
+            self.assertNotIn(id, self.base.__files__)
+
+    def test_validate_parallel(self):
+        now = datetime.datetime.now()
+        documents = [({'nome': str(i), 'cpf': str(i)} if i % 3 else
+            {'cpf': str(i)}, DocumentMetadata(i, now, now))
+            for i in range(10)]
+        results = list(self.base.validate_parallel(iter(documents),
+            processes=2, chunksize=3))
+        self.assertEqual(len(results), 10)
+        for i, (document, reldata, files, errors) in enumerate(results):
+            if i % 3:
+                self.assertEqual(errors, [])
+                self.assertEqual(document['nome'], str(i))
+                self.assertEqual(document['_metadata']['id_doc'], i)
+                self.assertEqual(reldata['cpf'], str(i))
+            else:
+                self.assertEqual(len(errors), 1)
+                self.assertIsInstance(errors[0], ValidationError)
+                self.assertEqual(document, {'cpf': str(i)})
+
+class DocumentStoreTest(unittest.TestCase):
+    """
+    Test relational data and files kept by base are bounded
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+        self.base.__reldata__.maxsize = 3
+        self.base.__files__.maxsize = 3
+
+    def validate(self, id, document):
+        now = datetime.datetime.now()
+        return self.base.validate(document, DocumentMetadata(id, now, now))
+
+    def test_store_is_bounded(self):
+        for id in range(1, 11):
+            self.validate(id, {'nome': str(id), 'cpf': str(id)})
+        self.assertEqual(len(self.base.__reldata__), 3)
+        self.assertEqual(len(self.base.__files__), 3)
+        self.assertNotIn(1, self.base.__reldata__)
+        self.assertEqual(self.base.__reldata__[10], {'cpf': '10'})
+
+    def test_release(self):
+        _, reldata, files, _ = self.validate(1, {'nome': 'a', 'cpf': '1'})
+        self.assertIs(self.base.__reldata__[1], reldata)
+        self.assertIs(self.base.__files__[1], files)
+        self.base.release(1)
+        self.assertNotIn(1, self.base.__reldata__)
+        self.assertNotIn(1, self.base.__files__)
+        self.base.release(1)
+
+    def test_failed_validation_is_released(self):
+        self.validate(1, {'nome': 'a', 'cpf': '1'})
+        self.assertRaises(ValidationError, self.validate, 1, {'cpf': '1'})
+        self.assertNotIn(1, self.base.__reldata__)
+
+    def test_metaclass_does_not_store(self):
+        Pessoa = self.base.metaclass()
+        Pessoa(nome='a', cpf='1')
+        self.assertEqual(len(self.base.__reldata__), 0)
+        self.assertEqual(len(self.base.__files__), 0)
+
+class ThreadSafetyTest(unittest.TestCase):
+    """
+    Test one base shared by many threads
+    """
+
+    threads = 16
+    iterations = 100
+
+    def setUp(self):
+        self.base = pessoa_base()
+        # Switch threads as often as possible.
+        if hasattr(sys, 'setswitchinterval'):
+            self.interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+
+    def tearDown(self):
+        if hasattr(sys, 'setswitchinterval'):
+            sys.setswitchinterval(self.interval)
+
+    def run_threads(self, target):
+        errors = [ ]
+
+        def run(n):
+            try:
+                for i in range(self.iterations):
+                    target(n, i)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(n,))
+            for n in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_validate(self):
+        now = datetime.datetime.now()
+
+        def validate(n, i):
+            id = n * self.iterations + i
+            engine = ('native', 'voluptuous')[n % 2]
+            document, reldata, files, _ = self.base.validate({
+                'nome': str(id),
+                'cpf': str(id),
+                'dependente': [{'idade_dep': id}, {'idade_dep': n}]
+            }, DocumentMetadata(id, now, now), engine=engine)
+            assert document['_metadata']['id_doc'] == id
+            assert reldata == {'cpf': str(id), 'idade_dep': [id, n]}, \
+                (id, reldata)
+
+        self.run_threads(validate)
+
+    def test_metaclass(self):
+        def build(n, i):
+            valreq = bool(n % 2)
+            Pessoa = self.base.metaclass(valreq=valreq)
+            Dependente = self.base.metaclass('dependente')
+            try:
+                pessoa = Pessoa(cpf=str(i),
+                    dependente=[Dependente(idade_dep=i)])
+            except TypeError:
+                assert valreq
+            else:
+                assert not valreq
+                assert pessoa.dependente[0].idade_dep == i
+
+        self.run_threads(build)
+
+class PathValidationTest(unittest.TestCase):
+    """
+    Test incremental validation of changed subtrees
+    """
+
+    def setUp(self):
+        self.base = pessoa_base()
+        now = datetime.datetime.now()
+        self.meta = DocumentMetadata(1, now, now)
+        self.document, _, _, _ = self.base.validate({
+            'nome': 'a',
+            'cpf': '1',
+            'dependente': [{'idade_dep': 10}, {'idade_dep': 12}]
+        }, self.meta)
+
+    def assertFullValidation(self, document, reldata):
+        """ Compare with the validation of the whole document.
+        """
+        _document, _reldata, _, _ = pessoa_base().validate(
+            copy.deepcopy(document), self.meta)
+        self.assertEqual(document, _document)
+        self.assertEqual(reldata, _reldata)
+
+    def test_leaf(self):
+        self.document['dependente'][1]['idade_dep'] = 20
+        document, reldata, _, _ = self.base.validate_path(self.document,
+            ['dependente', '1', 'idade_dep'], self.meta)
+        self.assertEqual(reldata, {'cpf': '1', 'idade_dep': [10, 20]})
+        self.assertIs(self.base.__reldata__[1], reldata)
+        self.assertFullValidation(document, reldata)
+
+        self.document['cpf'] = '2'
+        document, reldata, _, _ = self.base.validate_path(self.document,
+            ['cpf'], self.meta)
+        self.assertEqual(reldata['cpf'], '2')
+        self.assertFullValidation(document, reldata)
+
+    def test_subtree(self):
+        self.document['dependente'][0] = {'nome_dep': 'b'}
+        document, reldata, _, _ = self.base.validate_path(self.document,
+            ['dependente', '0'], self.meta)
+        self.assertEqual(reldata['idade_dep'], [None, 12])
+        self.assertFullValidation(document, reldata)
+
+        self.document['dependente'] = [{'idade_dep': 5}]
+        document, reldata, _, _ = self.base.validate_path(self.document,
+            ['dependente'], self.meta)
+        self.assertEqual(reldata['idade_dep'], [5])
+        self.assertFullValidation(document, reldata)
+
+        self.document['dependente'] = [ ]
+        document, reldata, _, _ = self.base.validate_path(self.document,
+            ['dependente'], self.meta)
+        self.assertIsNone(reldata['idade_dep'])
+        self.assertFullValidation(document, reldata)
+
+    def test_none(self):
+        self.document['dependente'].append({'idade_dep': 14})
+        self.document['endereco'] = {'rua': 'r', 'numero': 1}
+        self.base.validate(self.document, self.meta)
+        for path in (['dependente', '2', 'idade_dep'],
+                ['dependente', '0', 'idade_dep'],
+                ['dependente', '1', 'idade_dep'],
+                ['cpf'],
+                ['endereco', 'numero']):
+            parent = self.document
+            for node in path[:-1]:
+                parent = parent[int(node) if node.isdigit() else node]
+            parent[path[-1]] = None
+            document, reldata, _, _ = self.base.validate_path(self.document,
+                path, self.meta)
+            self.assertFullValidation(document, reldata)
+        self.assertNotIn('cpf', reldata)
+        self.assertNotIn('idade_dep', reldata)
+
+        del self.document['endereco']['numero']
+        document, reldata, _, _ = self.base.validate_path(self.document,
+            ['endereco', 'numero'], self.meta)
+        self.assertIsNone(reldata['numero'])
+        self.assertFullValidation(document, reldata)
+
+    def test_invalid(self):
+        self.document['dependente'][1]['idade_dep'] = 'x'
+        self.assertRaises(ValidationError, self.base.validate_path,
+            self.document, ['dependente', '1', 'idade_dep'], self.meta)
+        self.assertNotIn(1, self.base.__reldata__)
+
+        self.document['dependente'][1]['idade_dep'] = 12
+        self.base.validate(self.document, self.meta)
+        del self.document['nome']
+        self.assertRaises(ValidationError, self.base.validate_path,
+            self.document, ['nome'], self.meta)
+        self.assertRaises(ValidationError, self.base.validate_path,
+            self.document, ['dependente', '5', 'idade_dep'], self.meta)
+        self.assertRaises(ValidationError, self.base.validate_path,
+            self.document, ['unknown'], self.meta)
+
+    def test_not_stored(self):
+        self.base.release(1)
+        self.document['dependente'][1]['idade_dep'] = 20
+        _, reldata, _, _ = self.base.validate_path(self.document,
+            ['dependente', '1', 'idade_dep'], self.meta)
+        self.assertEqual(reldata, {'cpf': '1', 'idade_dep': [10, 20]})
+
+    def test_files(self):
+        base = dict2base({
+            'metadata': {'name': 'arquivos'},
+            'content': [field('anexos', 'File', multivalued=True)]})
+
+        def filemask(name):
+            return {
+                'id_file': '%s0a5c5b0-9b9a-4d6b-a0b8-1f7f2b6a4e3c' % name,
+                'filename': 'file.txt',
+                'mimetype': 'text/plain',
+                'filesize': 10,
+                'uuid': '0ea5c5b0-9b9a-4d6b-a0b8-1f7f2b6a4e3c'}
+
+        document, _, files, _ = base.validate({'anexos': [filemask('a'),
+            filemask('b')]}, self.meta)
+        self.assertEqual([f[0] for f in files], ['a', 'b'])
+        previous = document['anexos'][0]
+        document['anexos'][0] = filemask('c')
+        _, _, files, _ = base.validate_path(document, ['anexos', '0'],
+            self.meta, previous)
+        self.assertEqual(sorted(f[0] for f in files), ['b', 'c'])
+
+        # Without the old value files can't be told, so the whole
+        # document is validated.
+        document['anexos'] = [filemask('d')]
+        _, _, files, _ = base.validate_path(document, ['anexos'], self.meta)
+        self.assertEqual([f[0] for f in files], ['d'])
+
+class PasswordTest(unittest.TestCase):
+    """
+    Test password hashing modes
+    """
+
+    def setUp(self):
+        self.base = dict2base({
+            'metadata': {'name': 'usuario'},
+            'content': [
+                field('login', 'Text'),
+                field('senha', 'Password'),
+                {'group': {
+                    'metadata': {
+                        'name': 'contas',
+                        'alias': 'contas',
+                        'description': 'contas',
+                        'multivalued': True},
+                    'content': [field('pin', 'Password')]}},
+            ]})
+
+    def validate(self, document, id=1):
+        now = datetime.datetime.now()
+        document, _, _, _ = self.base.validate(document,
+            DocumentMetadata(id, now, now))
+        return document
+
+    def assertHash(self, password, hashed):
+        import bcrypt
+        self.assertEqual(bcrypt.hashpw(password.encode('utf-8'),
+            hashed.encode('utf-8')).decode('utf-8'), hashed)
+
+    def test_rehash(self):
+        hashed = self.validate({'senha': 'segredo'})['senha']
+        self.assertHash('segredo', hashed)
+        self.assertHash(hashed, self.validate({'senha': hashed})['senha'])
+
+    def test_keep_hashes(self):
+        self.base.keep_password_hashes = True
+        hashed = self.validate({'senha': 'segredo'})['senha']
+        self.assertHash('segredo', hashed)
+        self.assertEqual(self.validate({'senha': hashed})['senha'], hashed)
+        self.assertNotEqual(self.validate({'senha': hashed[:-1]})['senha'],
+            hashed[:-1])
+
+    def test_executor(self):
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+        except ImportError:
+            self.skipTest('concurrent.futures not available')
+        self.base.password_executor = ThreadPoolExecutor(4)
+        self.base.password_window = 2
+        self.addCleanup(self.base.password_executor.shutdown)
+
+        document = self.validate({'senha': 'a', 'contas': [{'pin': 'b'},
+            {'pin': 'c'}]})
+        self.assertHash('a', document['senha'])
+        self.assertHash('c', document['contas'][1]['pin'])
+
+        now = datetime.datetime.now()
+        documents = [({'login': str(i), 'senha': str(i)} if i != 3 else
+            {'senha': 3}, DocumentMetadata(i, now, now)) for i in range(6)]
+        results = list(self.base.validate_many(iter(documents)))
+        self.assertEqual(len(results), 6)
+        for i, (document, _, _, errors) in enumerate(results):
+            if i == 3:
+                self.assertEqual(len(errors), 1)
+            else:
+                self.assertEqual(errors, [])
+                self.assertEqual(document['login'], str(i))
+                self.assertHash(str(i), document['senha'])
+
+class DateParsingTest(unittest.TestCase):
+    """
+    Test fixed format date parsers give the same results as strptime
+    """
+
+    samples = {
+        '%d/%m/%Y': ['02/08/2014', '2/8/2014', '29/02/2016', '29/02/2015',
+            '00/01/2014', '31/13/2014', '32/01/2020', '31/04/2014',
+            '00/00/0000', '02/08/14', '02-08-2014',
+            '02/08/2014 ', 'aa/bb/cccc', '', 1, None],
+        '%H:%M:%S': ['10:21:49', '23:59:59', '24:00:00', '10:60:00',
+            '10:21:60', '99:99:99', '1:2:3', '10:21', '+1:21:49'],
+        '%d/%m/%Y %H:%M:%S': ['02/08/2014 10:21:49', '02/08/2014 1:21:49',
+            '02/08/2014T10:21:49', '02/08/2014 10:21:61',
+            '31/04/2014 10:21:49', '29/02/2015 10:21:49',
+            '02/08/2014 24:00:00', '02/08/2014 10:21:49.5'],
+    }
+
+    parsers = {
+        '%d/%m/%Y': (lbutils.parse_date, lambda d: d.date()),
+        '%H:%M:%S': (lbutils.parse_time, lambda d: d.time()),
+        '%d/%m/%Y %H:%M:%S': (lbutils.parse_datetime, lambda d: d),
+    }
+
+    def result(self, fn, value):
+        try:
+            return fn(value)
+        except (TypeError, ValueError) as e:
+            return type(e), str(e)
+
+    def test_strptime_parity(self):
+        for format, values in self.samples.items():
+            parser, convert = self.parsers[format]
+            for value in values:
+                expected = self.result(lambda v: convert(
+                    datetime.datetime.strptime(v, format)), value)
+                # Second call comes from cache.
+                self.assertEqual(self.result(parser, value), expected, value)
+                self.assertEqual(self.result(parser, value), expected, value)
+
+    def test_datatypes(self):
+        base = dict2base({
+            'metadata': {'name': 'datas'},
+            'content': [field('data', 'Date'), field('hora', 'Time'),
+                field('data_hora', 'DateTime')]})
+        meta = DocumentMetadata(1, '02/08/2014 10:21:49',
+            '02/08/2014 10:21:49')
+        self.assertEqual(meta.dt_doc, datetime.datetime(2014, 8, 2, 10, 21,
+            49))
+        document = {'data': '02/08/2014', 'hora': '10:21:49',
+            'data_hora': '02/08/2014 10:21:49'}
+        self.assertEqual(base.validate(dict(document), meta)[0]['data'],
+            '02/08/2014')
+        for key, value in [('data', '32/08/2014'), ('hora', '10:21'),
+                ('data_hora', '02/08/2014')]:
+            self.assertRaises(ValidationError, base.validate,
+                dict(document, **{key: value}), meta)
+
+class JsonCheckTest(unittest.TestCase):
+    """
+    Test JSON structure check used by Json fields
+    """
+
+    def result(self, fn, value):
+        try:
+            fn(value)
+        except Exception as e:
+            return type(e)
+
+    def test_encoder_parity(self):
+        for value in [{'a': [1, 2.5, {'b': None, 'c': True}]}, {1: 'a'},
+                {(1, 2): 'a'}, (1, [2]), datetime.datetime.now(), object(),
+                [{'a': set()}], float('nan'), u'ção']:
+            self.assertEqual(self.result(lbutils.check_json, value),
+                self.result(lbutils.object2json, value), repr(value))
+
+    def test_limits(self):
+        value = [ ]
+        for _ in range(10):
+            value = {'a': value}
+        self.assertEqual(lbutils.check_json(value, max_depth=11), 21)
+        self.assertRaises(ValueError, lbutils.check_json, value, 10)
+        self.assertRaises(ValueError, lbutils.check_json, value, None, 20)
+
+        circular = [ ]
+        circular.append(circular)
+        self.assertRaises(ValueError, lbutils.check_json, circular)
+
+    def test_datatype(self):
+        base = dict2base({
+            'metadata': {'name': 'blob'},
+            'content': [field('dados', 'Json')]})
+        now = datetime.datetime.now()
+        meta = DocumentMetadata(1, now, now)
+        document = {'dados': {'a': 'x' * 100}}
+        base.validate(dict(document), meta)
+        struct = base.get_struct('dados')
+        datatype = struct._datatype.__schema__
+        self.addCleanup(setattr, datatype, 'max_size', datatype.max_size)
+        datatype.max_size = 100
+        self.assertRaises(ValidationError, base.validate, dict(document),
+            meta)
+
+class RelationalPathTest(unittest.TestCase):
+    """
+    Test relational data placement for fields inside multivalued structures
+    """
+
+    def setUp(self):
+        self.base = dict2base({
+            'metadata': {'name': 'familia'},
+            'content': [
+                field('tags', 'Text', multivalued=True,
+                    indices=['Textual', 'Ordenado']),
+                {'group': {
+                    'metadata': {
+                        'name': 'pai',
+                        'alias': 'pai',
+                        'description': 'pai',
+                        'multivalued': True},
+                    'content': [
+                        {'group': {
+                            'metadata': {
+                                'name': 'filho',
+                                'alias': 'filho',
+                                'description': 'filho',
+                                'multivalued': True},
+                            'content': [
+                                field('idade', 'Integer',
+                                    indices=['Textual', 'Ordenado']),
+                            ]}},
+                    ]}},
+            ]})
+
+    def test_matrix(self):
+        reldata = { }
+        self.base.validator({
+            'tags': ['a', 'b'],
+            'pai': [
+                {'filho': [{'idade': 1}, {'idade': 2}]},
+                {'filho': [{'idade': 3}]},
+            ]
+        }, 1, reldata, [ ])
+        self.assertEqual(reldata['tags'], ['a', 'b'])
+        self.assertEqual(reldata['idade'], [[1, 2], [3]])
+
+    def test_explicit_path(self):
+        struct = self.base.get_struct('idade')
+        reldata = { }
+        datatype = struct._datatype.__schema__(self.base, struct, None,
+            ValidationContext(1, reldata, [ ]))
+        datatype(5, ['pai', 1, 'filho', 2, 'idade'])
+        self.assertEqual(reldata['idade'], [None, [None, None, 5]])
+        datatype(6)
+        self.assertEqual(reldata['idade'], 6)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -16,7 +16,8 @@ LightBase Library""",
     author_email='info@lightbase.com.br',
     url='http://lightbase.com.br/',
     license='',
-    packages=find_packages(exclude=['ez_setup', 'examples', 'tests']),
+    packages=find_packages(exclude=['ez_setup', 'examples', 'tests',
+        'benchmarks', 'benchmarks.*']),
     include_package_data=True,
     zip_safe=True,
     install_requires=[